@@ -0,0 +1,63 @@
+import argparse
+import math
+import os
+import timeit
+from typing import Iterator
+
+from pytest_insta.utils import hexdump, hexload
+
+
+def reference_hexdump(data: bytes, n: int = 16) -> Iterator[str]:
+    for k, i in enumerate(range((len(data) + n - 1) // n)):
+        values = data[i * n : (i + 1) * n]
+        line = values.hex(b" ", -2)
+        suffix = "".join(chr(i) if 32 <= i < 127 else "." for i in values)
+        yield f"{k * n:08x}:  {line:{math.ceil(n * 2.5)}} {suffix}"
+
+
+def reference_hexload(dump: str) -> bytes:
+    return b"".join(bytes.fromhex(line.split("  ")[1]) for line in dump.splitlines())
+
+
+def measure(function: object, argument: object, repeat: int) -> float:
+    timer = timeit.Timer(lambda: function(argument))  # type: ignore
+    return min(timer.repeat(repeat, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hexdump and hexload.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256, 1024])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'size':>8} {'function':>8} {'reference':>12} {'current':>12} {'speedup':>8}"
+    )
+
+    for size in args.sizes:
+        data = os.urandom(size * 1024)
+        dump = "\n".join(reference_hexdump(data)) + "\n"
+
+        if "\n".join(hexdump(data)) + "\n" != dump or hexload(dump) != data:
+            raise SystemExit(f"output mismatch for {size} KiB")
+
+        for name, reference, current, argument in [
+            (
+                "dump",
+                lambda d: list(reference_hexdump(d)),
+                lambda d: list(hexdump(d)),
+                data,
+            ),
+            ("load", reference_hexload, hexload, dump),
+        ]:
+            before = measure(reference, argument, args.repeat)
+            after = measure(current, argument, args.repeat)
+            throughput = size / 1024 / after
+            print(
+                f"{size:>6}Ki {name:>8} {before:>11.4f}s {after:>11.4f}s"
+                f" {before / after:>7.1f}x  ({throughput:.1f} MiB/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
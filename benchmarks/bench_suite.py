@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+import pytest_insta
+from pytest_insta import Fmt
+from pytest_insta.review import ReviewTest, ReviewTool
+from pytest_insta.session import SnapshotIndex
+from pytest_insta.storage import FileStorage
+from pytest_insta.utils import NODE_PATH_NAME, hexdump, node_path_name
+
+FORMATS = ["txt", "bin", "hexdump", "json", "pickle"]
+TESTS_PER_MODULE = 100
+
+MODULE = """\
+import pytest
+
+def value(fmt, i, variant):
+    if fmt == "txt":
+        return f"test {{i}} variant {{variant}}\\n" * 8
+    if fmt in ["bin", "hexdump"]:
+        return bytes((i + variant + k) % 256 for k in range(128))
+    return {{"test": i, "variant": variant, "items": list(range(16))}}
+
+@pytest.mark.parametrize("i", range({start}, {stop}))
+def test_snapshot(i, {fixture}):
+    fmt = {formats}[i % {count}]
+    expected = value(fmt, i, {variant})
+    assert {assertion} == expected
+"""
+
+NAMES_MODULE = """\
+import pytest
+
+class TestNames:
+    @pytest.mark.parametrize("i", range({tests}))
+    def test_name(self, i):
+        pass
+"""
+
+
+def generate(root: Path, tests: int, variant: int, baseline: bool = False):
+    shutil.rmtree(root / "tests", ignore_errors=True)
+    (root / "tests").mkdir(parents=True)
+
+    for start in range(0, tests, TESTS_PER_MODULE):
+        source = MODULE.format(
+            start=start,
+            stop=min(start + TESTS_PER_MODULE, tests),
+            fixture="request" if baseline else "snapshot",
+            formats=FORMATS,
+            count=len(FORMATS),
+            variant=variant,
+            assertion="expected" if baseline else "snapshot(fmt)",
+        )
+        (root / "tests" / f"test_{start:06d}.py").write_text(source)
+
+
+def run_pytest(root: Path, *args: str) -> float:
+    env = dict(os.environ, PYTEST_DISABLE_PLUGIN_AUTOLOAD="1")
+    env.pop("CI", None)
+    command = [sys.executable, "-m", "pytest", "-q", "-p", "pytest_insta.plugin"]
+
+    start = time.perf_counter()
+    process = subprocess.run(
+        [*command, *args, "tests"],
+        cwd=root,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    # A run that errors out early would otherwise look like a speedup.
+    if process.returncode:
+        sys.exit(f"{shlex.join([*args, 'tests'])} failed:\n{process.stdout}")
+
+    return elapsed
+
+
+def measure(function: Callable[[], Any], repeat: int) -> float:
+    return min(timeit.Timer(function).repeat(repeat, 1))
+
+
+def bench_suite(root: Path, tests: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+
+    def record(name: str, seconds: float, count: int):
+        results[f"{name}[{tests}]"] = {
+            "seconds": seconds,
+            "count": count,
+            "rate": count / seconds,
+        }
+
+    generate(root, tests, 0, baseline=True)
+    baseline = min(run_pytest(root) for _ in range(repeat))
+    record("baseline", baseline, tests)
+
+    generate(root, tests, 0)
+    shutil.rmtree(root / ".pytest_cache", ignore_errors=True)
+    record("collect", min(run_pytest(root, "--co") for _ in range(repeat)), tests)
+    record("create", run_pytest(root, "--insta", "update-new"), tests)
+
+    compare = min(run_pytest(root, "--insta", "update-none") for _ in range(repeat))
+    record("compare", compare, tests)
+    record("assert-overhead", max(compare - baseline, 0) or 1e-9, tests)
+
+    generate(root, tests, 1)
+    record("record", run_pytest(root, "--insta", "record"), tests)
+    record("review-only", run_pytest(root, "--insta", "review-only"), tests)
+    record("update", run_pytest(root, "--insta", "update"), tests)
+
+    return results
+
+
+def bench_micro(repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+
+    def record(name: str, function: Callable[[], Any], count: int):
+        seconds = measure(function, repeat)
+        results[name] = {"seconds": seconds, "count": count, "rate": count / seconds}
+
+    specs = [*FORMATS, *(f"name.{fmt}" for fmt in FORMATS), "name.a.b.json"] * 1000
+    record("from_spec", lambda: [Fmt.from_spec(spec) for spec in specs], len(specs))
+
+    data = os.urandom(1 << 20)
+    record("hexdump[1MiB]", lambda: list(hexdump(data)), len(data))
+
+    return results
+
+
+def bench_index(tests: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+
+    def record(name: str, function: Callable[[], Any], count: int):
+        seconds = measure(function, repeat)
+        results[name] = {"seconds": seconds, "count": count, "rate": count / seconds}
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory).resolve()
+        snapshots = root / "snapshots"
+        snapshots.mkdir()
+        names = [f"mod__test_{i}" for i in range(tests)]
+
+        for name in names:
+            (snapshots / f"{name}__0.txt").touch()
+
+        def lookup():
+            index = SnapshotIndex()
+            for name in names:
+                index.lookup(snapshots / name)
+
+        record(f"index[{tests}]", lookup, tests)
+
+        record_dir = root / "record"
+        shutil.copytree(snapshots, record_dir / "snapshots")
+        review_tool = ReviewTool(
+            None,  # type: ignore
+            SimpleNamespace(rootpath=root),
+            record_dir,
+            [
+                ReviewTest(name, root / "snapshots" / "mod.py", name, ("", 0, ""))
+                for name in names
+            ],
+            SnapshotIndex(),
+            FileStorage(),
+        )
+
+        def scan():
+            review_tool.index = SnapshotIndex()
+            review_tool.index.scan(record_dir)
+            return list(review_tool.scan_recorded_snapshots())
+
+        record(f"review-scan[{tests}]", scan, tests)
+
+    return results
+
+
+def bench_names(tests: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    items: List[pytest.Item] = []
+    parents: List[pytest.Collector] = []
+
+    # Nodes need to be measured during the session since some of their
+    # attributes are removed when the config is torn down.
+    class Collector:
+        def pytest_collection_finish(self, session: pytest.Session):
+            items.extend(session.items)
+            parents.extend({node for item in items for node in item.listchain()[:-1]})
+            seconds = measure(names, repeat)
+            results[f"node-names[{tests}]"] = {
+                "seconds": seconds,
+                "count": tests,
+                "rate": tests / seconds,
+            }
+
+    def names():
+        # Parents cache their names in their stash, which is cleared to
+        # measure the first lookups of a session every time.
+        for node in parents:
+            if NODE_PATH_NAME in node.stash:
+                del node.stash[NODE_PATH_NAME]
+        for item in items:
+            node_path_name(item)
+
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory).resolve()
+        (root / "test_names.py").write_text(NAMES_MODULE.format(tests=tests))
+        os.chdir(root)
+
+        try:
+            pytest.main(
+                ["--co", "-p", "no:terminal", "-p", "no:cacheprovider"],
+                plugins=[Collector()],
+            )
+        finally:
+            os.chdir(cwd)
+
+    return results
+
+
+def compare_results(results: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"\n{'benchmark':<28} {'baseline':>10} {'current':>10} {'change':>8}")
+
+    for name, result in results["results"].items():
+        if not (previous := baseline["results"].get(name)):
+            continue
+        before, after = previous["seconds"], result["seconds"]
+        print(f"{name:<28} {before:>9.4f}s {after:>9.4f}s {after / before - 1:>+7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the snapshot plugin.")
+    parser.add_argument("--tests", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--micro-only", action="store_true")
+    parser.add_argument("--output", metavar="FILE", help="Save the results as json.")
+    parser.add_argument(
+        "--compare", metavar="FILE", help="Compare with a previous run."
+    )
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "version": pytest_insta.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {},
+    }
+    sizes: List[int] = args.tests
+
+    print(f"{'benchmark':<28} {'seconds':>10} {'per second':>12}")
+
+    def report(suite: Dict[str, Dict[str, float]]):
+        for name, result in suite.items():
+            results["results"][name] = result
+            print(f"{name:<28} {result['seconds']:>9.4f}s {result['rate']:>12.0f}")
+
+    report(bench_micro(args.repeat))
+
+    for tests in sizes:
+        report(bench_index(tests, args.repeat))
+        report(bench_names(tests, args.repeat))
+
+        if not args.micro_only:
+            with tempfile.TemporaryDirectory() as directory:
+                report(bench_suite(Path(directory), tests, args.repeat))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
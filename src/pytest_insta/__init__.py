@@ -1,5 +1,7 @@
 from .fixture import *  # noqa: F403
 from .format import *  # noqa: F403
+from .profile import *  # noqa: F403
 from .session import *  # noqa: F403
+from .storage import *  # noqa: F403
 
 __version__ = "0.4.0"
@@ -0,0 +1,147 @@
+__all__ = ["SnapshotBundle", "SnapshotBundles"]
+
+
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Set
+from zipfile import ZipFile, ZipInfo
+
+from .utils import atomic_path, locked_path, remove_path
+
+BUNDLE_EXTENSION = ".zip"
+
+
+def bundle_path(path: Path) -> Path:
+    return path.with_name(path.name.split("__")[0] + BUNDLE_EXTENSION)
+
+
+@dataclass
+class SnapshotBundle:
+    path: Path
+    archive: Optional[ZipFile] = None
+    members: Dict[str, List[ZipInfo]] = field(default_factory=dict[str, List[ZipInfo]])
+    changes: Dict[str, Optional[Dict[str, bytes]]] = field(
+        default_factory=dict[str, Optional[Dict[str, bytes]]]
+    )
+
+    def __post_init__(self):
+        with suppress(FileNotFoundError):
+            self.archive = ZipFile(self.path)
+            for info in self.archive.infolist():
+                if not info.is_dir():
+                    name = info.filename.split("/")[0]
+                    self.members.setdefault(name, []).append(info)
+
+    @property
+    def names(self) -> Set[str]:
+        names = self.members.keys() | self.changes.keys()
+        return {name for name in names if self.has(name)}
+
+    def has(self, name: str) -> bool:
+        if name in self.changes:
+            return self.changes[name] is not None
+        return name in self.members
+
+    def read(self, name: str) -> Dict[str, bytes]:
+        if (members := self.changes.get(name)) is not None:
+            return members
+        if not self.archive or name not in self.members:
+            raise FileNotFoundError(f"{name!r} not found in {str(self.path)!r}")
+        return {
+            info.filename[len(name) + 1 :]: self.archive.read(info)
+            for info in self.members[name]
+        }
+
+    def write(self, name: str, members: Dict[str, bytes]):
+        self.changes[name] = members
+
+    def delete(self, name: str):
+        self.changes[name] = None
+
+    def save(self):
+        if not self.changes:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Other processes might have updated the bundle in the meantime so the
+        # changes are applied on top of a fresh copy while holding a lock.
+        with locked_path(self.path):
+            self.close()
+            current = SnapshotBundle(self.path)
+            contents = {name: current.read(name) for name in current.names}
+            current.close()
+
+            for name, members in self.changes.items():
+                if members is None:
+                    contents.pop(name, None)
+                else:
+                    contents[name] = members
+
+            if not contents:
+                remove_path(self.path)
+                return
+
+            with atomic_path(self.path) as tmp, ZipFile(tmp, "w") as archive:
+                for name in sorted(contents):
+                    for member, data in sorted(contents[name].items()):
+                        info = ZipInfo(f"{name}/{member}" if member else name)
+                        info.external_attr = 0o644 << 16
+                        archive.writestr(info, data)
+
+        self.__post_init__()
+        self.changes = {}
+
+    def close(self):
+        if self.archive:
+            self.archive.close()
+            self.archive = None
+            self.members = {}
+
+
+@dataclass
+class SnapshotBundles(Dict[Path, SnapshotBundle]):
+    enabled: bool = False
+    replaced: Set[Path] = field(default_factory=set[Path])
+    lock: Lock = field(default_factory=Lock)
+
+    def __missing__(self, path: Path) -> SnapshotBundle:
+        # Snapshots can be written from background threads so the bundle
+        # mustn't be replaced once another thread started adding changes.
+        with self.lock:
+            if (bundle := self.get(path)) is None:
+                bundle = self[path] = SnapshotBundle(path)
+            return bundle
+
+    def is_bundle(self, path: Path) -> bool:
+        return path.name.endswith(BUNDLE_EXTENSION) and "__" not in path.name
+
+    def locate(self, path: Path) -> Optional[SnapshotBundle]:
+        bundle = self[bundle_path(path)]
+        return bundle if bundle.has(path.name) else None
+
+    def target(self, path: Path) -> Optional[SnapshotBundle]:
+        bundle = self[bundle_path(path)]
+        return bundle if self.enabled or bundle.archive or bundle.changes else None
+
+    def write(self, path: Path, members: Dict[str, bytes]):
+        if bundle := self.target(path):
+            bundle.write(path.name, members)
+            self.replaced.add(path)
+
+    def delete(self, path: Path):
+        if bundle := self.locate(path):
+            bundle.delete(path.name)
+
+    def flush(self):
+        for bundle in self.values():
+            bundle.save()
+
+        # Snapshots that moved into a bundle are only removed from the
+        # directory once the bundle has been saved.
+        for path in self.replaced:
+            remove_path(path)
+
+        self.replaced = set()
@@ -0,0 +1,124 @@
+__all__ = ["structural_diff"]
+
+
+from dataclasses import fields, is_dataclass
+from typing import Any, Iterator, List, Optional
+
+from _pytest._io.saferepr import saferepr
+
+CONTAINERS = (dict, list, tuple, set, frozenset)
+
+
+def structural_diff(
+    left: Any,
+    right: Any,
+    limit: int = 10,
+    threshold: int = 64,
+) -> Optional[List[str]]:
+    if not is_structure(left) or not is_structure(right):
+        return None
+    if count_nodes(left, threshold) + count_nodes(right, threshold) < threshold:
+        return None
+
+    differences: List[str] = []
+
+    try:
+        for difference in walk(left, right, ""):
+            differences.append(difference)
+            if len(differences) > limit:
+                break
+    except RecursionError:
+        return None
+
+    if not differences:
+        return None
+
+    maxsize = (80 - 15 - 2 - 2) // 2
+    lines = [f"{saferepr(left, maxsize)} == {saferepr(right, maxsize)}"]
+
+    if len(differences) > limit:
+        lines.append(f"Showing the first {limit} differences:")
+        differences = differences[:limit]
+    else:
+        lines.append("Differences:")
+
+    lines.extend(f"  {difference}" for difference in differences)
+
+    return lines
+
+
+def is_structure(value: Any) -> bool:
+    return isinstance(value, CONTAINERS) or (
+        is_dataclass(value) and not isinstance(value, type)
+    )
+
+
+def count_nodes(value: Any, threshold: int) -> int:
+    count = 0
+    stack = [value]
+
+    while stack and count < threshold:
+        value = stack.pop()
+        count += 1
+        if isinstance(value, dict):
+            stack.extend(value.values())  # type: ignore
+        elif isinstance(value, CONTAINERS):
+            stack.extend(value)  # type: ignore
+        elif is_dataclass(value) and not isinstance(value, type):
+            stack.extend(vars(value).values())
+
+    return count
+
+
+def walk(left: Any, right: Any, path: str) -> Iterator[str]:
+    if left is right:
+        return
+
+    try:
+        # Comparing whole subtrees happens in c for builtin types so it's much
+        # faster than walking identical parts of the structure one by one.
+        if type(left) is type(right) and left == right:
+            return
+    except Exception:
+        pass
+
+    location = path or "(root)"
+
+    if isinstance(left, dict) and isinstance(right, dict):
+        for key, value in left.items():  # type: ignore
+            if key in right:
+                yield from walk(value, right[key], f"{path}[{key!r}]")
+            else:
+                yield f"{location}: {key!r} only in left: {saferepr(value)}"
+        for key, value in right.items():  # type: ignore
+            if key not in left:
+                yield f"{location}: {key!r} only in right: {saferepr(value)}"
+
+    elif isinstance(left, (list, tuple)) and isinstance(right, (list, tuple)):
+        if type(left) is not type(right):
+            yield f"{location}: {type(left).__name__} != {type(right).__name__}"
+        for i, (a, b) in enumerate(zip(left, right)):  # type: ignore
+            yield from walk(a, b, f"{path}[{i}]")
+        for i in range(len(right), len(left)):  # type: ignore
+            yield f"{path}[{i}] only in left: {saferepr(left[i])}"
+        for i in range(len(left), len(right)):  # type: ignore
+            yield f"{path}[{i}] only in right: {saferepr(right[i])}"
+
+    elif isinstance(left, (set, frozenset)) and isinstance(right, (set, frozenset)):
+        for value in left - right:  # type: ignore
+            yield f"{location}: only in left: {saferepr(value)}"
+        for value in right - left:  # type: ignore
+            yield f"{location}: only in right: {saferepr(value)}"
+
+    elif (
+        is_dataclass(left) and not isinstance(left, type) and type(left) is type(right)
+    ):
+        for field in fields(left):
+            yield from walk(
+                getattr(left, field.name),
+                getattr(right, field.name),
+                f"{path}.{field.name}",
+            )
+
+    elif left != right:
+        yield f"{location}: {saferepr(left)} != {saferepr(right)}"
@@ -1,9 +1,10 @@
 __all__ = ["SnapshotFixture", "SnapshotRecorder", "SnapshotNotfound"]
 
 
+import copy
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, SupportsIndex
 
 from _pytest import fixtures
 from wrapt import ObjectProxy
@@ -24,32 +25,77 @@ class SnapshotNotfound:
 class SnapshotRecorder(ObjectProxy):
     __wrapped__: Any
 
-    def __init__(self, path: Path, fmt: Fmt[Any], ctx: SnapshotContext, current: Any):
-        super().__init__(current)  # type: ignore
+    def __init__(
+        self,
+        path: Path,
+        fmt: Fmt[Any],
+        ctx: SnapshotContext,
+        session: SnapshotSession,
+        nodeid: str,
+    ):
+        super().__init__(None)  # type: ignore
         self._self_path = path
         self._self_fmt = fmt
         self._self_ctx = ctx
+        self._self_session = session
+        self._self_nodeid = nodeid
+        self._self_loaded = False
+
+    def __wrapped_factory__(self) -> Any:
+        if self._self_path in self._self_ctx.available:
+            return self._self_session.load(
+                self._self_path, self._self_fmt, self._self_nodeid
+            )
+        return SnapshotNotfound(self._self_path)
+
+    def __wrapped_get__(self) -> Any:
+        self.__wrapped__ = self.__wrapped_factory__()
+        self._self_loaded = True
+        return self.__wrapped__
 
     def __eq__(self, other: Any) -> bool:
-        if self.__wrapped__ == other:
-            self._self_ctx.matching.add(self._self_path)
-        else:
-            self._self_ctx.differing[self._self_path] = self._self_fmt, other
-            self.__wrapped__ = other
-        return True
+        with self._self_session.profile.measure(self._self_nodeid, "compare"):
+            matching = (
+                self._self_session.compare(
+                    self._self_path, self._self_fmt, other, self._self_nodeid
+                )
+                if not self._self_loaded and self._self_path in self._self_ctx.available
+                else None
+            )
+
+            if matching or (matching is None and self.__wrapped__ == other):
+                self._self_ctx.matching.add(self._self_path)
+            else:
+                self._self_ctx.differing[self._self_path] = self._self_fmt, other
+                self.__wrapped__ = other
+                self._self_loaded = True
+            return True
+
+    def __repr__(self) -> str:
+        return repr(self.__wrapped__)
+
+    def __copy__(self) -> Any:
+        return copy.copy(self.__wrapped__)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Any:
+        return copy.deepcopy(self.__wrapped__, memo)
+
+    def __reduce_ex__(self, protocol: SupportsIndex) -> Any:
+        return self.__wrapped__.__reduce_ex__(protocol)
 
 
 @dataclass
 class SnapshotFixture:
     ctx: SnapshotContext
     session: SnapshotSession
+    nodeid: str
 
     @classmethod
     def from_request(cls, request: fixtures.FixtureRequest) -> "SnapshotFixture":
         path, name = node_path_name(request.node)  # type: ignore
         path = path.with_name("snapshots") / name
         session: SnapshotSession = getattr(request.config, "_snapshot_session")
-        return cls(session[path], session)
+        return cls(session[path], session, request.node.nodeid)
 
     def __call__(self, spec: str = ".txt") -> Any:
         __tracebackhide__ = True
@@ -64,22 +110,28 @@ class SnapshotFixture:
 
         path = self.ctx.path.with_name(f"{self.ctx.path.name}__{name}")
 
-        current = (
-            fmt.load(path) if path in self.ctx.available else SnapshotNotfound(path)
+        exists = path in self.ctx.available
+        record = self.session.should_update or (
+            self.session.should_create and not exists
         )
 
-        return (
-            SnapshotRecorder(path, fmt, self.ctx, current)
-            if self.session.should_update
-            or (self.session.should_create and isinstance(current, SnapshotNotfound))
-            else current
-        )
+        if not record and not exists:
+            return SnapshotNotfound(path)
+
+        if not record:
+            # Snapshots that can't change are returned as is, the session only
+            # remembers them to explain failing comparisons.
+            value = self.session.load(path, fmt, self.nodeid)
+            self.session.loaded.add(id(value))
+            return value
+
+        return SnapshotRecorder(path, fmt, self.ctx, self.session, self.nodeid)
 
     def __enter__(self) -> "SnapshotFixture":
         return self
 
     def __exit__(self, *_):
-        self.ctx.flush(self.session)
+        self.ctx.flush(self.session, self.nodeid)
 
     def __repr__(self) -> str:
         return "snapshot"
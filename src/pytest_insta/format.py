@@ -1,27 +1,87 @@
-__all__ = ["Fmt", "FmtText", "FmtBinary", "FmtHexdump", "FmtJson", "FmtPickle"]
+__all__ = [
+    "Fmt",
+    "FmtText",
+    "FmtBinary",
+    "FmtHexdump",
+    "FmtJson",
+    "FmtPickle",
+    "FmtCompressed",
+]
 
 
+import bz2
+import gzip
+import io
 import json
+import lzma
 import pickle
+import shutil
 from itertools import accumulate
 from pathlib import Path
-from typing import Any, ClassVar, Dict, Generic, Optional, Tuple, Type, TypeVar
+from tempfile import TemporaryDirectory
+from typing import (
+    IO,
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
-from .utils import hexdump, hexload
+from .utils import atomic_path, hexdump, hexload, mapped_equal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
 
 T = TypeVar("T")
 
+COMPRESSIONS: Dict[str, Callable[[IO[bytes], str], IO[bytes]]] = {
+    # The gzip header would otherwise contain the modification time and the
+    # name of the temporary file which would change the snapshot every time.
+    ".gz": lambda f, mode: gzip.GzipFile("", mode, fileobj=f, mtime=0),  # type: ignore
+    ".bz2": lambda f, mode: bz2.BZ2File(f, mode),  # type: ignore
+    ".xz": lambda f, mode: lzma.LZMAFile(f, mode),  # type: ignore
+}
+
 
 class Fmt(Generic[T]):
     extension: ClassVar[str] = ""
+    singleton: ClassVar[bool] = True
     registry: ClassVar[Dict[str, Type["Fmt[Any]"]]] = {}
+    specs: ClassVar[Dict[str, Tuple[Optional[str], Optional[Type["Fmt[Any]"]]]]] = {}
+    instances: ClassVar[Dict[Type["Fmt[Any]"], "Fmt[Any]"]] = {}
 
     def __init_subclass__(cls):
         if cls.extension:
             cls.registry[cls.extension] = cls
+            cls.specs.clear()
 
     @classmethod
     def from_spec(cls, spec: str) -> Tuple[Optional[str], Optional["Fmt[Any]"]]:
+        if (resolved := cls.specs.get(spec)) is None:
+            resolved = cls.specs[spec] = cls.resolve_spec(spec)
+
+        name, format_cls = resolved
+
+        if not format_cls:
+            return None, None
+        if not format_cls.singleton:
+            return name, format_cls()
+        if not (fmt := cls.instances.get(format_cls)):
+            fmt = cls.instances[format_cls] = format_cls()
+        return name, fmt
+
+    @classmethod
+    def resolve_spec(
+        cls, spec: str
+    ) -> Tuple[Optional[str], Optional[Type["Fmt[Any]"]]]:
         for name, key in [
             (None, spec),
             (None, f".{spec}"),
@@ -35,13 +95,48 @@ class Fmt(Generic[T]):
             ),
         ]:
             if format_cls := cls.registry.get(key):
-                return name, format_cls()
+                return name, format_cls
+
+        suffix = Path(spec).suffix
+
+        if suffix in COMPRESSIONS:
+            name, format_cls = cls.resolve_spec(spec[: -len(suffix)])
+            if format_cls and not issubclass(format_cls, FmtCompressed):
+                return name and name + suffix, FmtCompressed.wrap(format_cls, suffix)
+
         return None, None
 
     def load(self, path: Path) -> T:
-        raise NotImplementedError()
+        return self.deserialize(path.read_bytes())
 
     def dump(self, path: Path, value: T) -> None:
+        path.write_bytes(self.serialize(value))
+
+    def dump_atomic(self, path: Path, value: T, fsync: bool = False):
+        with atomic_path(path, fsync) as tmp:
+            self.dump(tmp, value)
+
+    def load_file(self, f: IO[bytes]) -> T:
+        with TemporaryDirectory() as directory:
+            path = Path(directory, f"snapshot{self.extension}")
+            with path.open("wb") as tmp:
+                shutil.copyfileobj(f, tmp)
+            return self.load(path)
+
+    def dump_file(self, f: IO[bytes], value: T):
+        with TemporaryDirectory() as directory:
+            path = Path(directory, f"snapshot{self.extension}")
+            self.dump(path, value)
+            with path.open("rb") as tmp:
+                shutil.copyfileobj(tmp, f)
+
+    def compare(self, path: Path, value: Any) -> Optional[bool]:
+        return None
+
+    def serialize(self, value: T) -> bytes:
+        raise NotImplementedError()
+
+    def deserialize(self, data: bytes) -> T:
         raise NotImplementedError()
 
 
@@ -54,6 +149,20 @@ class FmtText(Fmt[str]):
     def dump(self, path: Path, value: str):
         path.write_text(value, "utf-8")
 
+    def load_file(self, f: IO[bytes]) -> str:
+        return self.deserialize(f.read())
+
+    def dump_file(self, f: IO[bytes], value: str):
+        f.write(self.serialize(value))
+
+    def serialize(self, value: str) -> bytes:
+        if not isinstance(value, str):
+            raise TypeError(f"expected str, got {type(value).__name__}")
+        return value.encode("utf-8")
+
+    def deserialize(self, data: bytes) -> str:
+        return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
 
 class FmtBinary(Fmt[bytes]):
     extension = ".bin"
@@ -64,6 +173,25 @@ class FmtBinary(Fmt[bytes]):
     def dump(self, path: Path, value: bytes):
         path.write_bytes(value)
 
+    def load_file(self, f: IO[bytes]) -> bytes:
+        return f.read()
+
+    def dump_file(self, f: IO[bytes], value: bytes):
+        f.write(value)
+
+    def compare(self, path: Path, value: Any) -> Optional[bool]:
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            return None
+        return mapped_equal(path, value)
+
+    def serialize(self, value: bytes) -> bytes:
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            raise TypeError(f"expected bytes, got {type(value).__name__}")
+        return bytes(value)
+
+    def deserialize(self, data: bytes) -> bytes:
+        return data
+
 
 class FmtHexdump(Fmt[bytes]):
     extension = ".hexdump"
@@ -74,15 +202,91 @@ class FmtHexdump(Fmt[bytes]):
     def dump(self, path: Path, value: bytes):
         path.write_text("\n".join(hexdump(value)) + "\n", "utf-8")
 
+    def load_file(self, f: IO[bytes]) -> bytes:
+        text = io.TextIOWrapper(f, "utf-8")
+        chunks: List[bytes] = []
+
+        try:
+            while lines := text.readlines(1 << 20):
+                chunks.append(hexload("".join(lines)))
+        finally:
+            text.detach()
+
+        return b"".join(chunks)
+
+    def dump_file(self, f: IO[bytes], value: bytes):
+        text = io.TextIOWrapper(f, "utf-8", newline="")
+        text.writelines(f"{line}\n" for line in hexdump(value))
+        text.detach()
+
+    def compare(self, path: Path, value: Any) -> Optional[bool]:
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            return None
+
+        view = memoryview(value).cast("B")
+        offset = 0
+
+        with path.open(encoding="utf-8") as f:
+            while lines := f.readlines(1 << 20):
+                chunk = hexload("".join(lines))
+                if view[offset : offset + len(chunk)] != chunk:
+                    return False
+                offset += len(chunk)
+
+        return offset == view.nbytes
+
+    def serialize(self, value: bytes) -> bytes:
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            raise TypeError(f"expected bytes, got {type(value).__name__}")
+        return ("\n".join(hexdump(bytes(value))) + "\n").encode("utf-8")
+
+    def deserialize(self, data: bytes) -> bytes:
+        return hexload(data.decode("utf-8"))
+
 
 class FmtJson(Fmt[Any]):
     extension = ".json"
+    backend: ClassVar[str] = "json"
+    canonical: ClassVar[bool] = False
 
     def load(self, path: Path) -> Any:
-        return json.loads(path.read_text("utf-8"))
+        with path.open("rb") as f:
+            return self.load_file(f)
+
+    def load_file(self, f: IO[bytes]) -> Any:
+        data = f.read()
+
+        if orjson:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+
+        return json.loads(data)
 
     def dump(self, path: Path, value: Any):
-        path.write_text(json.dumps(value, indent=2) + "\n", "utf-8")
+        if self.backend == "json":
+            text = json.dumps(value, indent=2, sort_keys=self.canonical)
+            path.write_text(text + "\n", "utf-8")
+        elif self.backend == "orjson":
+            if not orjson:
+                raise ModuleNotFoundError("the orjson backend requires orjson")
+            option = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            if self.canonical:
+                option |= orjson.OPT_SORT_KEYS
+            path.write_bytes(orjson.dumps(value, option=option) + b"\n")
+        else:
+            raise ValueError(f"invalid json backend {self.backend!r}")
+
+    def dump_file(self, f: IO[bytes], value: Any):
+        if self.backend != "json":
+            super().dump_file(f, value)
+            return
+
+        text = io.TextIOWrapper(f, "utf-8", newline="")
+        json.dump(value, text, indent=2, sort_keys=self.canonical)
+        text.write("\n")
+        text.detach()
 
 
 class FmtPickle(Fmt[Any]):
@@ -93,3 +297,47 @@ class FmtPickle(Fmt[Any]):
 
     def dump(self, path: Path, value: Any):
         path.write_bytes(pickle.dumps(value))
+
+    def load_file(self, f: IO[bytes]) -> Any:
+        return pickle.load(f)
+
+    def dump_file(self, f: IO[bytes], value: Any):
+        pickle.dump(value, f)
+
+
+class FmtCompressed(Fmt[Any]):
+    fmt: ClassVar[Type[Fmt[Any]]]
+    compression: ClassVar[str]
+
+    @classmethod
+    def wrap(cls, format_cls: Type[Fmt[Any]], compression: str) -> Type[Fmt[Any]]:
+        name = format_cls.__name__ + compression[1:].capitalize()
+        namespace = {
+            "extension": format_cls.extension + compression,
+            "singleton": format_cls.singleton,
+            "fmt": format_cls,
+            "compression": compression,
+        }
+        return type(name, (cls,), namespace)
+
+    def open(self, f: IO[bytes], mode: str) -> IO[bytes]:
+        return COMPRESSIONS[self.compression](f, mode)
+
+    def load(self, path: Path) -> Any:
+        with path.open("rb") as f:
+            return self.load_file(f)
+
+    def dump(self, path: Path, value: Any):
+        with path.open("wb") as f:
+            self.dump_file(f, value)
+
+    def load_file(self, f: IO[bytes]) -> Any:
+        with self.open(f, "rb") as decompressed:
+            return self.fmt().load_file(decompressed)
+
+    def dump_file(self, f: IO[bytes], value: Any):
+        with self.open(f, "wb") as compressed:
+            self.fmt().dump_file(compressed, value)
+
+    def deserialize(self, data: bytes) -> Any:
+        return self.load_file(io.BytesIO(data))
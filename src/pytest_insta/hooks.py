@@ -0,0 +1,27 @@
+__all__ = ["pytest_insta_profile", "pytest_insta_storage"]
+
+
+from typing import Any, Optional
+
+import pytest
+
+from .profile import SnapshotProfile
+from .storage import SnapshotStorage
+
+
+def pytest_insta_profile(config: Any, profile: SnapshotProfile):
+    """Called at the end of the session with the snapshot operations of each test.
+
+    The profile maps test node ids to counters for the number of snapshot
+    loads, dumps, comparisons and flushes, along with the time they took and
+    the number of bytes read and written.
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_insta_storage(config: Any) -> Optional[SnapshotStorage]:
+    """Return the storage used to read and write snapshots.
+
+    Stop at the first non-None result. Snapshots are stored as files in the
+    snapshots directory next to the test modules when no storage is returned.
+    """
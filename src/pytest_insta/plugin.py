@@ -3,7 +3,9 @@
 
 import pytest
 
-from .fixture import SnapshotFixture
+from . import hooks
+from .diff import structural_diff
+from .fixture import SnapshotFixture, SnapshotRecorder
 from .session import SnapshotSession
 
 
@@ -31,14 +33,110 @@ def pytest_addoption(parser):
         help="Set the snapshot strategy. "
         'Defaults to "auto" when the argument is not specified.',
     )
+    group.addoption(
+        "--insta-shard",
+        metavar="FILE",
+        help="Save the snapshots used by this run to FILE and leave "
+        "unused snapshots for a run with --insta-reconcile to delete.",
+    )
+    group.addoption(
+        "--insta-reconcile",
+        metavar="FILE",
+        action="append",
+        default=[],
+        help="Only delete unused snapshots that are also unused "
+        "according to the given --insta-shard file. Can be repeated.",
+    )
+    group.addoption(
+        "--insta-accept",
+        metavar="PATTERN",
+        action="append",
+        default=[],
+        help="Accept the recorded snapshots of tests whose node id or snapshot "
+        "name match the glob PATTERN without prompting. Can be repeated.",
+    )
+    group.addoption(
+        "--insta-reject",
+        metavar="PATTERN",
+        action="append",
+        default=[],
+        help="Reject the recorded snapshots of tests whose node id or snapshot "
+        "name match the glob PATTERN without prompting. Can be repeated.",
+    )
+    group.addoption(
+        "--insta-decisions",
+        metavar="FILE",
+        help="Apply the decisions from a file saved with --insta-review-export.",
+    )
+    group.addoption(
+        "--insta-review-export",
+        metavar="FILE",
+        help="Save the snapshots left to review to FILE as json "
+        "instead of reviewing them interactively.",
+    )
+    group.addoption(
+        "--insta-writers",
+        metavar="N",
+        type=int,
+        default=0,
+        help="Write snapshots from N background threads instead of "
+        "during test teardown. Defaults to 0.",
+    )
+    group.addoption(
+        "--insta-fsync",
+        action="store_true",
+        help="Flush snapshots to disk before moving them into place.",
+    )
+    group.addoption(
+        "--insta-bundle",
+        action="store_true",
+        help="Store the snapshots of each test module in a single zip file.",
+    )
+    group.addoption(
+        "--insta-dedup",
+        action="store_true",
+        help="Store identical snapshots once and hardlink them into place.",
+    )
+    group.addoption(
+        "--insta-prefetch",
+        metavar="N",
+        type=int,
+        default=0,
+        help="Read the snapshots of the next N tests in the background. Defaults to 0.",
+    )
+    group.addoption(
+        "--insta-profile",
+        action="store_true",
+        help="Show the time spent loading, comparing and writing snapshots.",
+    )
+    group.addoption(
+        "--insta-profile-json",
+        metavar="FILE",
+        help="Save the snapshot profile of each test to FILE as json.",
+    )
+
+
+def pytest_addhooks(pluginmanager):
+    pluginmanager.add_hookspecs(hooks)
 
 
 def pytest_sessionstart(session):
     session.config._snapshot_session = SnapshotSession(session)
 
 
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    item.config._snapshot_session.prefetch(item)
+
+
+@pytest.hookimpl(tryfirst=True)
 def pytest_runtestloop(session):
-    return session.config._snapshot_session.should_skip_testloop or None
+    snapshot_session = session.config._snapshot_session
+
+    if snapshot_session.should_skip_testloop:
+        if snapshot_session.is_controller:
+            session.perform_collect()
+        return True
 
 
 def pytest_sessionfinish(session, exitstatus):
@@ -47,3 +145,24 @@ def pytest_sessionfinish(session, exitstatus):
 
 def pytest_terminal_summary(terminalreporter, exitstatus, config):
     config._snapshot_session.write_summary()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    if data := getattr(node, "workeroutput", {}).get("insta"):
+        node.config._snapshot_session.merge(data)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_assertrepr_compare(config, op, left, right):
+    snapshots = config._snapshot_session.loaded
+
+    if op == "==" and any(
+        isinstance(value, SnapshotRecorder) or id(value) in snapshots
+        for value in [left, right]
+    ):
+        return structural_diff(unwrap(left), unwrap(right))
+
+
+def unwrap(value):
+    return value.__wrapped__ if isinstance(value, SnapshotRecorder) else value
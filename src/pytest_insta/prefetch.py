@@ -0,0 +1,90 @@
+__all__ = ["SnapshotPrefetcher"]
+
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Optional, OrderedDict
+
+from .storage import FileStorage, SnapshotStorage
+
+
+@dataclass
+class SnapshotPrefetcher:
+    storage: SnapshotStorage = field(default_factory=FileStorage)
+    ahead: int = 0
+    workers: int = 4
+    limit: int = 64 << 20
+    executor: Optional[ThreadPoolExecutor] = field(init=False, default=None)
+    pending: Dict[Path, "Future[None]"] = field(
+        default_factory=dict[Path, "Future[None]"]
+    )
+    cache: OrderedDict[Path, Dict[str, bytes]] = field(
+        default_factory=OrderedDict[Path, Dict[str, bytes]]
+    )
+    size: int = 0
+    lock: Lock = field(default_factory=Lock)
+
+    def __post_init__(self):
+        if self.ahead:
+            workers = min(self.ahead, self.workers)
+            self.executor = ThreadPoolExecutor(workers, "insta-prefetch")
+
+    def submit(self, paths: Iterable[Path]):
+        if not self.executor:
+            return
+
+        for path in paths:
+            if path not in self.pending and path not in self.cache:
+                self.pending[path] = self.executor.submit(self.fetch, path)
+
+    def fetch(self, path: Path):
+        members = self.storage.read(path)
+        size = sum(map(len, members.values()))
+
+        if size > self.limit:
+            return
+
+        with self.lock:
+            self.cache[path] = members
+            self.size += size
+
+            while self.size > self.limit:
+                _, evicted = self.cache.popitem(last=False)
+                self.size -= sum(map(len, evicted.values()))
+
+    def get(self, path: Path) -> Optional[Dict[str, bytes]]:
+        if future := self.pending.pop(path, None):
+            # Snapshots that the pool didn't get to yet are faster to read
+            # directly than waiting for everything queued before them.
+            if future.cancel() or future.exception():
+                return None
+
+        with self.lock:
+            if path in self.cache:
+                self.cache.move_to_end(path)
+            return self.cache.get(path)
+
+    def pop(self, path: Path) -> Optional[Dict[str, bytes]]:
+        members = self.get(path)
+        self.discard(path)
+        return members
+
+    def discard(self, path: Path):
+        if future := self.pending.pop(path, None):
+            if not future.cancel():
+                future.exception()
+
+        with self.lock:
+            if (members := self.cache.pop(path, None)) is not None:
+                self.size -= sum(map(len, members.values()))
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+        self.pending = {}
+        self.cache.clear()
+        self.size = 0
@@ -0,0 +1,61 @@
+__all__ = ["SnapshotProfile"]
+
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Counter, Dict, Iterator
+
+OPERATIONS = ["load", "dump", "compare", "flush"]
+
+
+@dataclass
+class SnapshotProfile(Dict[str, Counter[str]]):
+    lock: Lock = field(default_factory=Lock)
+
+    def __missing__(self, nodeid: str) -> Counter[str]:
+        self[nodeid] = Counter[str]()
+        return self[nodeid]
+
+    @property
+    def total(self) -> Counter[str]:
+        total = Counter[str]()
+        for counters in self.values():
+            total.update(counters)
+        return total
+
+    def add(self, nodeid: str, **counters: float):
+        with self.lock:
+            self[nodeid].update(counters)
+
+    @contextmanager
+    def measure(self, nodeid: str, operation: str) -> Iterator[Counter[str]]:
+        counters = Counter[str]({operation: 1})
+        start = time.perf_counter()
+
+        try:
+            yield counters
+        finally:
+            counters[f"{operation}_time"] += time.perf_counter() - start
+            with self.lock:
+                self[nodeid].update(counters)
+
+    def slowest(self, count: int) -> Dict[str, float]:
+        # Snapshots are loaded during comparisons and dumped during flushes
+        # unless they're written in the background, which doesn't block tests.
+        durations = {
+            nodeid: counters["compare_time"] + counters["flush_time"]
+            for nodeid, counters in self.items()
+        }
+        return dict(sorted(durations.items(), key=lambda item: -item[1])[:count])
+
+    def export(self) -> Dict[str, Any]:
+        return {
+            "total": dict(self.total),
+            "tests": {nodeid: dict(counters) for nodeid, counters in self.items()},
+        }
+
+    def merge(self, data: Dict[str, Any]):
+        for nodeid, counters in data["tests"].items():
+            self.add(nodeid, **counters)
@@ -1,17 +1,44 @@
-__all__ = ["ReviewTool"]
+__all__ = ["ReviewTool", "ReviewTest", "load_decisions"]
 
 
+import json
 import os
 from code import InteractiveConsole
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Collection, Dict, Iterator, List, Optional, Tuple
 
 from _pytest.terminal import TerminalReporter
 
+from .diff import structural_diff
 from .format import Fmt
+from .storage import SnapshotStorage
 from .utils import node_path_name
 
+if TYPE_CHECKING:
+    from .session import SnapshotIndex
+
+SUMMARY_LINES = 10
+DECISIONS = ["accept", "reject", "skip"]
+
+
+def load_decisions(filename: str) -> Dict[str, Tuple[str, Optional[str]]]:
+    with open(filename) as f:
+        data = json.load(f)
+
+    decisions: Dict[str, Tuple[str, Optional[str]]] = {}
+
+    for review in data["reviews"]:
+        if (decision := review.get("decision")) is None:
+            continue
+        if decision not in DECISIONS:
+            raise ValueError(f"invalid review decision {decision!r}")
+        decisions[review["recorded"]] = decision, review.get("new")
+
+    return decisions
+
 
 class ReviewEnvironment(Dict[str, Any]):
     outcome: Optional[Tuple[str, str]] = None
@@ -35,82 +62,221 @@ class ReviewConsole(InteractiveConsole):
         return super().raw_input(prompt)
 
 
+@dataclass(frozen=True)
+class ReviewTest:
+    nodeid: str
+    path: Path
+    name: str
+    location: Tuple[str, int, str]
+
+    @classmethod
+    def from_item(cls, item: Any) -> "ReviewTest":
+        path, name = node_path_name(item)
+        return cls(item.nodeid, path, name, item.location)
+
+    @classmethod
+    def from_export(cls, data: List[Any]) -> "ReviewTest":
+        nodeid, path, name, (module, line, domain) = data
+        return cls(nodeid, Path(path), name, (module, line, domain))
+
+    def export(self) -> List[Any]:
+        return [self.nodeid, str(self.path), self.name, list(self.location)]
+
+
 @dataclass
 class ReviewTool:
     tr: TerminalReporter
     config: Any
     record_dir: Path
-    tests: Collection[Any]
+    tests: Collection[ReviewTest]
+    index: "SnapshotIndex"
+    storage: SnapshotStorage
+    ahead: int = 4
+    headless: bool = False
+    accept: List[str] = field(default_factory=list[str])
+    reject: List[str] = field(default_factory=list[str])
+    decisions: Dict[str, Tuple[str, Optional[str]]] = field(
+        default_factory=dict[str, Tuple[str, Optional[str]]]
+    )
+    skipped: List[Tuple[ReviewTest, Path, Path]] = field(
+        default_factory=list[Tuple[ReviewTest, Path, Path]]
+    )
+
+    def scan_recorded_snapshots(self) -> Iterator[Tuple[ReviewTest, Path, Path]]:
+        directories: Dict[Path, Tuple[Path, Path]] = {}
+        cwd = Path(".").resolve()
 
-    def scan_recorded_snapshots(self) -> Iterator[Tuple[Any, Path, Path]]:
         for test in self.tests:
-            path, name = node_path_name(test)
-            directory = path.parent.resolve().relative_to(self.config.rootpath)
-
-            for snapshot in (self.record_dir / directory).glob(f"{name}__*"):
-                original = Path(
-                    os.path.relpath(
-                        self.config.rootpath / directory / "snapshots" / snapshot.name,
-                        Path(".").resolve(),
-                    )
+            if not (paths := directories.get(test.path.parent)):
+                directory = test.path.parent.resolve().relative_to(self.config.rootpath)
+                snapshots = self.config.rootpath / directory / "snapshots"
+                paths = directories[test.path.parent] = (
+                    self.record_dir / directory,
+                    Path(os.path.relpath(snapshots, cwd)),
                 )
-                yield test, snapshot, original
 
-    def display_assertion(self, old: Any, new: Any):
-        self.tr.write_line("\n>       assert old == new")
+            record_dir, snapshots = paths
 
-        lines, *_ = self.config.hook.pytest_assertrepr_compare(
-            config=self.config, op="==", left=old, right=new
-        )
+            for snapshot in sorted(self.index.lookup(record_dir / test.name)):
+                yield test, snapshot, snapshots / snapshot.name
+
+    def explain_assertion(self, old: Any, new: Any) -> List[str]:
+        lines = structural_diff(old, new)
+
+        if not lines:
+            lines, *_ = self.config.hook.pytest_assertrepr_compare(
+                config=self.config, op="==", left=old, right=new
+            )
 
         explanation = "assert " + "\n".join("  " + line for line in lines).strip()
+        return explanation.splitlines()
+
+    def display_assertion(self, explanation: List[str]):
+        self.tr.write_line("\n>       assert old == new")
 
-        for line in explanation.splitlines():
+        for line in explanation:
             self.tr.write_line(f"E       {line}", blue=True, bold=True)
 
+    def prepare(self, recorded: Path, original: Path, fmt: Fmt[Any]) -> Tuple[Any, Any]:
+        return self.storage.load(original, fmt), self.storage.load(recorded, fmt)
+
     def collect(self) -> Iterator[Tuple[Path, Optional[Path]]]:
-        to_review: List[Tuple[Any, Path, Path]] = []
+        to_review: List[Tuple[ReviewTest, Path, Path]] = []
 
         for test, recorded, original in self.scan_recorded_snapshots():
-            if original.exists():
+            if self.storage.exists(original):
                 to_review.append((test, recorded, original))
             else:
                 yield recorded, None
 
+        if self.headless:
+            for test, recorded, original in to_review:
+                decision = self.decide(test, recorded)
+                if decision == "accept":
+                    yield recorded, original
+                elif decision == "reject":
+                    yield recorded, None
+                else:
+                    self.skipped.append((test, recorded, original))
+            return
+
         if to_review:
             self.tr.write_line("")
             self.tr.section("SNAPSHOT REVIEWS")
 
-        for i, (test, recorded, original) in enumerate(to_review):
-            self.tr.ensure_newline()
-            self.tr.section(f"[{i + 1}/{len(to_review)}]", "_", blue=True, bold=True)
-
-            self.tr.write_line(f"\nold: {original!s}")
-            self.tr.write_line(f"new: {recorded!s}")
+        formats = [Fmt.from_spec(original.name)[1] for _, _, original in to_review]
+        executor = (
+            ThreadPoolExecutor(self.ahead, "insta-review") if self.ahead else None
+        )
+        pending: Dict[int, "Future[Tuple[Any, Any]]"] = {}
 
-            if not (fmt := Fmt.from_spec(original.name)[1]):
-                self.tr.write_line(
-                    f"\ninvalid snapshot format: {original.name!r}", red=True, bold=True
+        try:
+            for i, (test, recorded, original) in enumerate(to_review):
+                self.tr.ensure_newline()
+                self.tr.section(
+                    f"[{i + 1}/{len(to_review)}]", "_", blue=True, bold=True
                 )
-                continue
-
-            old = fmt.load(original)
-            new = fmt.load(recorded)
-
-            self.display_assertion(old, new)
-
-            module, line, name = test.location
 
-            self.tr.write(f"\n{module}", blue=True, bold=True)
-            self.tr.write_line(f":{line + 1}: {name}")
+                self.tr.write_line(f"\nold: {original!s}")
+                self.tr.write_line(f"new: {recorded!s}")
 
-            decision, message = self.prompt(old, new)
-            self.tr.write_line(message, bold=True)
-
-            if decision == "a":
-                yield recorded, original
-            elif decision == "r":
-                yield recorded, None
+                if not (fmt := formats[i]):
+                    self.tr.write_line(
+                        f"\ninvalid snapshot format: {original.name!r}",
+                        red=True,
+                        bold=True,
+                    )
+                    self.skipped.append((test, recorded, original))
+                    continue
+
+                if not executor:
+                    old, new = self.prepare(recorded, original, fmt)
+                else:
+                    # The next few snapshots are decoded in the background while the
+                    # current one is reviewed. Explanations call hooks from other
+                    # plugins so they're only rendered on the main thread.
+                    for j in range(i, min(i + self.ahead + 1, len(to_review))):
+                        if j not in pending and (upcoming := formats[j]):
+                            _, upcoming_recorded, upcoming_original = to_review[j]
+                            pending[j] = executor.submit(
+                                self.prepare,
+                                upcoming_recorded,
+                                upcoming_original,
+                                upcoming,
+                            )
+                    old, new = pending.pop(i).result()
+
+                self.display_assertion(self.explain_assertion(old, new))
+
+                module, line, name = test.location
+
+                self.tr.write(f"\n{module}", blue=True, bold=True)
+                self.tr.write_line(f":{line + 1}: {name}")
+
+                decision, message = self.prompt(old, new)
+                self.tr.write_line(message, bold=True)
+
+                if decision == "a":
+                    yield recorded, original
+                elif decision == "r":
+                    yield recorded, None
+                else:
+                    self.skipped.append((test, recorded, original))
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def decide(self, test: ReviewTest, recorded: Path) -> Optional[str]:
+        if entry := self.decisions.get(str(recorded)):
+            decision, digest = entry
+            # Snapshots recorded again since the export need a new decision.
+            if digest and digest != self.storage.digest(recorded):
+                return None
+            return decision
+
+        names = [test.nodeid, recorded.name]
+
+        if any(fnmatch(name, pattern) for pattern in self.reject for name in names):
+            return "reject"
+        if any(fnmatch(name, pattern) for pattern in self.accept for name in names):
+            return "accept"
+
+        return None
+
+    def decode(
+        self, review: Tuple[ReviewTest, Path, Path]
+    ) -> Optional[Tuple[Any, Any]]:
+        _, recorded, original = review
+        if fmt := Fmt.from_spec(original.name)[1]:
+            return self.prepare(recorded, original, fmt)
+        return None
+
+    def summarize(
+        self, review: Tuple[ReviewTest, Path, Path], values: Optional[Tuple[Any, Any]]
+    ) -> Dict[str, Any]:
+        test, recorded, original = review
+        fmt = Fmt.from_spec(original.name)[1]
+
+        if values:
+            summary = self.explain_assertion(*values)[:SUMMARY_LINES]
+        else:
+            summary = [f"invalid snapshot format: {original.name!r}"]
+
+        return {
+            "nodeid": test.nodeid,
+            "recorded": str(recorded),
+            "snapshot": str(original),
+            "format": fmt and fmt.extension,
+            "old": self.storage.digest(original),
+            "new": self.storage.digest(recorded),
+            "summary": summary,
+            "decision": None,
+        }
+
+    def export(self) -> Dict[str, Any]:
+        with ThreadPoolExecutor(max(self.ahead, 1), "insta-review") as executor:
+            decoded = list(executor.map(self.decode, self.skipped))
+        return {"reviews": list(map(self.summarize, self.skipped, decoded))}
 
     def prompt(self, old: Any, new: Any) -> Tuple[str, str]:
         review_env = ReviewEnvironment(old=old, new=new)
@@ -1,18 +1,121 @@
 __all__ = ["SnapshotSession", "SnapshotContext"]
 
 
+import json
 import os
-import shutil
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Set, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from _pytest.terminal import TerminalReporter
-from pytest import Session
+from pytest import ExitCode, Session
 
+from .bundle import SnapshotBundles
 from .format import Fmt
-from .review import ReviewTool
-from .utils import is_ci, pluralize, remove_path, rename_path
+from .prefetch import SnapshotPrefetcher
+from .profile import OPERATIONS, SnapshotProfile
+from .review import ReviewTest, ReviewTool, load_decisions
+from .storage import DedupStorage, FileStorage, SnapshotStorage, load_members
+from .utils import (
+    content_digest,
+    format_size,
+    is_ci,
+    node_path_name,
+    pluralize,
+    snapshot_prefixes,
+)
+from .writer import SnapshotWriter
+
+
+@dataclass
+class SnapshotIndex(Dict[Path, Dict[str, Set[Path]]]):
+    storage: SnapshotStorage = field(default_factory=FileStorage)
+
+    def __missing__(self, directory: Path) -> Dict[str, Set[Path]]:
+        self[directory] = {}
+        for name in self.storage.list(directory):
+            self.add(directory / name)
+        return self[directory]
+
+    def lookup(self, path: Path) -> Set[Path]:
+        return set(self[path.parent].get(path.name, ()))
+
+    def add(self, path: Path):
+        prefixes = self[path.parent]
+        for prefix in snapshot_prefixes(path.name):
+            prefixes.setdefault(prefix, set()).add(path)
+
+    def discard(self, path: Path):
+        prefixes = self[path.parent]
+        for prefix in snapshot_prefixes(path.name):
+            if paths := prefixes.get(prefix):
+                paths.discard(path)
+
+    def scan(self, root: Path) -> Set[Path]:
+        snapshots: Set[Path] = set()
+
+        for path in self.storage.walk(root):
+            self.setdefault(path.parent, {})
+            self.add(path)
+            snapshots.add(path)
+
+        return snapshots
+
+
+@dataclass
+class SnapshotDigests(Dict[Path, str]):
+    manifest: Dict[str, List[Any]]
+    changes: Dict[str, Optional[List[Any]]] = field(
+        default_factory=dict[str, Optional[List[Any]]]
+    )
+    storage: SnapshotStorage = field(default_factory=FileStorage)
+
+    def __missing__(self, path: Path) -> str:
+        if digest := self.cached(path):
+            return digest
+
+        key = os.path.abspath(path)
+        stat = self.storage.stat(path)
+        digest = self.storage.digest(path)
+
+        # Files modified very recently could change again without
+        # affecting their mtime so they only get cached on the next run.
+        if stat and time.time_ns() - stat[0] > 2_000_000_000:
+            entry = [*stat, digest]
+            self.manifest[key] = self.changes[key] = entry
+
+        self[path] = digest
+        return digest
+
+    def cached(self, path: Path) -> Optional[str]:
+        if path in self:
+            return self[path]
+
+        if not (stat := self.storage.stat(path)):
+            return None
+
+        entry = self.manifest.get(os.path.abspath(path))
+
+        if entry and entry[:-1] == [*stat]:
+            self[path] = entry[-1]
+            return entry[-1]
+
+        return None
+
+    def discard(self, path: Path):
+        self.pop(path, None)
+        key = os.path.abspath(path)
+        if self.manifest.pop(key, None):
+            self.changes[key] = None
+
+    def merge(self, changes: Dict[str, Optional[List[Any]]]):
+        for key, entry in changes.items():
+            if entry:
+                self.manifest[key] = entry
+            else:
+                self.manifest.pop(key, None)
+            self.changes[key] = entry
 
 
 @dataclass
@@ -23,9 +126,6 @@ class SnapshotContext:
     matching: Set[Path]
     differing: Dict[Path, Tuple[Fmt[Any], Any]]
 
-    def __post_init__(self):
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-
     @property
     def created(self) -> Dict[Path, Tuple[Fmt[Any], Any]]:
         return {
@@ -46,10 +146,19 @@ class SnapshotContext:
     def deleted(self) -> Set[Path]:
         return self.available - self.matching - self.differing.keys()
 
-    def flush(self, session: "SnapshotSession"):
+    def flush(self, session: "SnapshotSession", nodeid: str):
+        with session.profile.measure(nodeid, "flush"):
+            self.write(session, nodeid)
+
+        self.reset()
+        session.loaded.clear()
+
+    def write(self, session: "SnapshotSession", nodeid: str):
         if session.should_create:
             for path, (fmt, value) in self.created.items():
-                fmt.dump(path, value)
+                session.writer.submit(nodeid, path, fmt, value)
+                session.index.add(path)
+                session.digests.discard(path)
                 session.created.add(path)
 
         if session.should_record:
@@ -57,24 +166,22 @@ class SnapshotContext:
             record_dir = session.record_dir / directory.relative_to(
                 session.config.rootpath
             )
-            record_dir.mkdir(parents=True, exist_ok=True)
 
             for path, (fmt, value) in self.updated.items():
                 path = record_dir / path.name
-                fmt.dump(path, value)
+                session.writer.submit(nodeid, path, fmt, value)
                 session.recorded.add(path)
 
         elif session.should_update:
             for path, (fmt, value) in self.updated.items():
-                fmt.dump(path, value)
+                session.prefetcher.discard(path)
+                session.writer.submit(nodeid, path, fmt, value)
+                session.digests.discard(path)
                 session.updated.add(path)
 
         if session.should_delete:
-            for path in self.deleted:
-                remove_path(path)
-                session.deleted.add(path)
-
-        self.reset()
+            session.stale.update(self.deleted)
+            session.used.update(self.matching, self.differing)
 
     def reset(self):
         self.counter = 0
@@ -94,7 +201,21 @@ class SnapshotSession(Dict[Path, SnapshotContext]):
     created: Set[Path] = field(default_factory=set[Path])
     updated: Set[Path] = field(default_factory=set[Path])
     deleted: Set[Path] = field(default_factory=set[Path])
+    stale: Set[Path] = field(default_factory=set[Path])
+    used: Set[Path] = field(default_factory=set[Path])
     notices: List[str] = field(default_factory=list[str])
+    storage: SnapshotStorage = field(init=False)
+    index: SnapshotIndex = field(init=False)
+    record_index: SnapshotIndex = field(init=False)
+    to_review: Optional[Set[Path]] = None
+    profile: SnapshotProfile = field(default_factory=SnapshotProfile)
+    digests: SnapshotDigests = field(init=False)
+    tests: Dict[str, ReviewTest] = field(default_factory=dict[str, ReviewTest])
+    writer: SnapshotWriter = field(init=False)
+    prefetcher: SnapshotPrefetcher = field(init=False)
+    positions: Optional[Dict[str, int]] = None
+    prefetched: int = 0
+    loaded: Set[int] = field(default_factory=set[int])
 
     def __post_init__(self):
         self.config = self.session.config
@@ -112,16 +233,120 @@ class SnapshotSession(Dict[Path, SnapshotContext]):
 
         self.tr = tr
 
+        option = self.config.option
+        storage = self.config.hook.pytest_insta_storage(config=self.config)
+
+        if storage is None:
+            storage_cls = DedupStorage if option.insta_dedup else FileStorage
+            storage = storage_cls(
+                option.insta_fsync, SnapshotBundles(option.insta_bundle)
+            )
+
+        self.storage = storage
+        self.index = SnapshotIndex(self.storage)
+        self.record_index = SnapshotIndex(self.storage)
+        self.digests = SnapshotDigests(
+            cache.get("insta/manifest", {}), storage=self.storage
+        )
+
+        self.writer = SnapshotWriter(
+            self.config.option.insta_writers,
+            self.storage,
+            self.profile,
+        )
+
+        # Workers only know the order of the whole collection, not which tests
+        # the controller is going to schedule on them.
+        self.prefetcher = SnapshotPrefetcher(
+            self.storage, 0 if self.is_worker else option.insta_prefetch
+        )
+
         self.strategy = self.config.option.insta
         if self.strategy == "auto":
             self.strategy = "update-none" if is_ci() else "update-new"
 
     def __missing__(self, path: Path) -> SnapshotContext:
-        available = set(path.parent.glob(f"{path.name}__*"))
+        available = self.index.lookup(path)
         ctx = SnapshotContext(path, 0, available, set(), {})
         self[path] = ctx
         return ctx
 
+    def prefetch(self, item: Any):
+        if not self.prefetcher.ahead:
+            return
+
+        items = self.session.items
+
+        if self.positions is None:
+            self.positions = {item.nodeid: i for i, item in enumerate(items)}
+        if (position := self.positions.get(item.nodeid)) is None:
+            return
+
+        start = max(position + 1, self.prefetched)
+        stop = position + 1 + self.prefetcher.ahead
+
+        for upcoming in items[start:stop]:
+            path, name = node_path_name(upcoming)
+            self.prefetcher.submit(
+                self.index.lookup(path.with_name("snapshots") / name)
+            )
+
+        self.prefetched = max(stop, self.prefetched)
+
+    def load(self, path: Path, fmt: Fmt[Any], nodeid: str) -> Any:
+        self.writer.wait(path)
+
+        with self.profile.measure(nodeid, "load") as counters:
+            if (members := self.prefetcher.pop(path)) is not None:
+                counters["load_bytes"] += sum(map(len, members.values()))
+                counters["load_prefetched"] += 1
+                return load_members(path, fmt, members)
+
+            counters["load_bytes"] += self.storage.size(path)
+            return self.storage.load(path, fmt)
+
+    def compare(
+        self, path: Path, fmt: Fmt[Any], value: Any, nodeid: str
+    ) -> Optional[bool]:
+        self.writer.wait(path)
+
+        if (members := self.prefetcher.get(path)) is not None and [*members] == [""]:
+            try:
+                data = fmt.serialize(value)
+            except (NotImplementedError, TypeError):
+                return None
+
+            # Serializing doesn't always produce the exact bytes that were
+            # written so a mismatch still needs to load the snapshot.
+            if members[""] != data:
+                return None
+
+            self.prefetcher.discard(path)
+            self.profile.add(nodeid, compare_prefetched=1)
+            return True
+
+        if self.digests.cached(path) is not None:
+            self.profile.add(nodeid, compare_cache_hits=1)
+        else:
+            matching = self.storage.compare(path, fmt, value)
+            if matching is not None:
+                return matching
+
+        try:
+            data = fmt.serialize(value)
+        except (NotImplementedError, TypeError):
+            return None
+
+        return True if content_digest(data) == self.digests[path] else None
+
+    @property
+    def is_worker(self) -> bool:
+        return hasattr(self.config, "workerinput")
+
+    @property
+    def is_controller(self) -> bool:
+        return self.config.pluginmanager.hasplugin("dsession")
+
     @property
     def should_record(self) -> bool:
         return self.strategy in ["record", "review"]
@@ -151,41 +376,197 @@ class SnapshotSession(Dict[Path, SnapshotContext]):
         return self.strategy in ["update", "clear"]
 
     def on_finish(self, status: int = 0):
+        self.prefetcher.close()
+        self.writer.drain()
+
+        if self.is_worker:
+            self.storage.flush()
+            self.config.workeroutput["insta"] = self.export()
+            return
+
+        for path, *_ in self.writer.errors:
+            self.recorded.discard(path)
+            self.created.discard(path)
+            self.updated.discard(path)
+
+        if self.writer.errors:
+            self.session.exitstatus = status = ExitCode.TESTS_FAILED
+
+        if self.should_delete:
+            self.reconcile()
+
+        # Bundled snapshots only appear in listings once they're saved, so the
+        # recorded snapshots need to be flushed before they can be reviewed.
+        self.storage.flush()
+
         if not status:
             self.on_success()
+            self.storage.flush()
+
+        if self.digests.changes:
+            self.config.cache.set("insta/manifest", self.digests.manifest)
+
+        self.notices.extend(self.storage.summary())
 
         if snapshots_to_review := self.count_snapshots_to_review():
             self.notices.append(
                 pluralize("snapshot", snapshots_to_review) + " to review"
             )
 
+        if report := self.config.option.insta_profile_json:
+            with open(report, "w") as f:
+                json.dump(self.profile.export(), f, indent=2)
+
+        self.config.hook.pytest_insta_profile(config=self.config, profile=self.profile)
+
     def on_success(self):
         if self.should_review:
             capture = self.config.pluginmanager.getplugin("capturemanager")
             capture.suspend_global_capture(True)
 
+            tests = self.tests.values() or [
+                ReviewTest.from_item(item) for item in self.session.items
+            ]
+
+            option = self.config.option
+            decisions = option.insta_decisions and load_decisions(
+                option.insta_decisions
+            )
+
             review_tool = ReviewTool(
-                self.tr, self.config, self.record_dir, self.session.items
+                self.tr,
+                self.config,
+                self.record_dir,
+                tests,
+                self.record_index,
+                self.storage,
+                headless=bool(
+                    option.insta_accept
+                    or option.insta_reject
+                    or option.insta_decisions
+                    or option.insta_review_export
+                ),
+                accept=option.insta_accept,
+                reject=option.insta_reject,
+                decisions=decisions or {},
             )
 
-            for snapshot, destination in review_tool.collect():
-                if destination:
-                    rename_path(snapshot, destination)
-                    self.updated.add(destination)
-                else:
-                    remove_path(snapshot)
-                    self.rejected.add(snapshot)
-                self.recorded.discard(snapshot)
+            accepted: Dict[Path, Path] = {}
+            rejected: List[Path] = []
+
+            # Decisions are applied in a single pass at the end, including the
+            # ones made before an error interrupted the review.
+            try:
+                for snapshot, destination in review_tool.collect():
+                    if destination:
+                        accepted[snapshot] = destination
+                    else:
+                        rejected.append(snapshot)
+            finally:
+                self.apply_reviews(accepted, rejected)
+
+            if report := option.insta_review_export:
+                with open(report, "w") as f:
+                    json.dump(review_tool.export(), f, indent=2)
 
         if self.should_clear_recorded and (
             snapshots_to_clear := self.count_snapshots_to_review()
         ):
-            shutil.rmtree(self.record_dir)
+            self.storage.delete(self.record_dir)
+            self.record_index.clear()
+            self.to_review = set()
             self.notices.append(
                 pluralize("recorded snapshot", snapshots_to_clear) + " cleared"
             )
 
+    def apply_reviews(self, accepted: Dict[Path, Path], rejected: List[Path]):
+        to_review = self.collect_snapshots_to_review()
+
+        self.storage.move_many(accepted)
+        self.storage.delete_many(rejected)
+
+        for destination in accepted.values():
+            self.index.add(destination)
+            self.digests.discard(destination)
+            self.updated.add(destination)
+
+        self.rejected.update(rejected)
+
+        for snapshot in [*accepted, *rejected]:
+            self.recorded.discard(snapshot)
+            self.record_index.discard(snapshot)
+            to_review.discard(snapshot)
+
+    def reconcile(self):
+        if shard := self.config.option.insta_shard:
+            with open(shard, "w") as f:
+                json.dump(self.export_usage(), f)
+            return
+
+        for filename in self.config.option.insta_reconcile:
+            with open(filename) as f:
+                self.merge_usage(json.load(f))
+
+        unused = self.stale - self.used
+        self.storage.delete_many(unused)
+
+        for path in unused:
+            self.index.discard(path)
+            self.digests.discard(path)
+            self.deleted.add(path)
+
+    def export_usage(self) -> Dict[str, Any]:
+        return {
+            "stale": sorted(str(path) for path in self.stale),
+            "used": sorted(str(path) for path in self.used),
+        }
+
+    def merge_usage(self, data: Dict[str, Any]):
+        self.stale.update(map(Path, data["stale"]))
+        self.used.update(map(Path, data["used"]))
+
+    def export(self) -> Dict[str, Any]:
+        return {
+            "recorded": [str(path) for path in self.recorded],
+            "created": [str(path) for path in self.created],
+            "updated": [str(path) for path in self.updated],
+            "usage": self.export_usage(),
+            "manifest": self.digests.changes,
+            "profile": self.profile.export(),
+            "storage": self.storage.export(),
+            "errors": [
+                [str(path), nodeid, message]
+                for path, nodeid, message in self.writer.errors
+            ],
+            "tests": (
+                [ReviewTest.from_item(item).export() for item in self.session.items]
+                if self.should_review
+                else []
+            ),
+        }
+
+    def merge(self, data: Dict[str, Any]):
+        self.recorded.update(map(Path, data["recorded"]))
+        self.created.update(map(Path, data["created"]))
+        self.updated.update(map(Path, data["updated"]))
+        self.merge_usage(data["usage"])
+        self.digests.merge(data["manifest"])
+        self.profile.merge(data["profile"])
+        self.storage.merge(data["storage"])
+
+        for path, nodeid, message in data["errors"]:
+            self.writer.errors.append((Path(path), nodeid, message))
+
+        for test in map(ReviewTest.from_export, data["tests"]):
+            self.tests.setdefault(test.nodeid, test)
+
     def write_summary(self):
+        if self.is_worker:
+            return
+
+        if self.config.option.insta_profile:
+            self.write_profile()
+
         report = {
             "RECORD": self.recorded,
             "REJECT": self.rejected,
@@ -194,7 +575,7 @@ class SnapshotSession(Dict[Path, SnapshotContext]):
             "DELETE": self.deleted,
         }
 
-        if not any(report.values()) and not self.notices:
+        if not any(report.values()) and not self.notices and not self.writer.errors:
             return
 
         self.tr.ensure_newline()
@@ -204,24 +585,46 @@ class SnapshotSession(Dict[Path, SnapshotContext]):
             for snapshot in sorted(snapshots):
                 self.tr.write_line(f"{operation} {snapshot}")
 
+        for snapshot, nodeid, message in sorted(self.writer.errors):
+            self.tr.write("ERROR ", red=True, bold=True)
+            self.tr.write_line(f"{snapshot} ({nodeid}) - {message}")
+
         if self.notices:
-            if any(report.values()):
+            if any(report.values()) or self.writer.errors:
                 self.tr.write_line("")
 
             for notice in self.notices:
                 self.tr.write("NOTICE ", bold=True, yellow=True)
                 self.tr.write_line(notice)
 
+    def write_profile(self):
+        total = self.profile.total
+
+        self.tr.ensure_newline()
+        self.tr.section("SNAPSHOT PROFILE", blue=True)
+
+        for operation in OPERATIONS:
+            line = (
+                f"{operation:<8}{total[operation]:>8.0f} calls"
+                f"{total[f'{operation}_time']:>10.3f}s"
+            )
+            if size := total[f"{operation}_bytes"]:
+                line += f"  {format_size(size)}"
+            if operation == "compare" and total["compare_cache_hits"]:
+                line += f"  {total['compare_cache_hits']:.0f} cached digests"
+            if prefetched := total[f"{operation}_prefetched"]:
+                line += f"  {prefetched:.0f} prefetched"
+            self.tr.write_line(line)
+
+        if slowest := self.profile.slowest(10):
+            self.tr.write_line("")
+            for nodeid, duration in slowest.items():
+                self.tr.write_line(f"{duration:>9.3f}s  {nodeid}")
+
     def count_snapshots_to_review(self) -> int:
-        return len(list(self.collect_snapshots_to_review()))
-
-    def collect_snapshots_to_review(self) -> Iterable[str]:
-        for _, dirs, files in os.walk(self.record_dir):
-            directory_snapshots = {
-                directory
-                for directory in dirs
-                if any(directory.endswith(extension) for extension in Fmt.registry)
-            }
-            dirs[:] = set(dirs) - directory_snapshots
-            yield from directory_snapshots
-            yield from files
+        return len(self.collect_snapshots_to_review())
+
+    def collect_snapshots_to_review(self) -> Set[Path]:
+        if self.to_review is None:
+            self.to_review = self.record_index.scan(self.record_dir)
+        return self.to_review
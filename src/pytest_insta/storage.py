@@ -0,0 +1,410 @@
+__all__ = ["SnapshotStorage", "FileStorage", "DedupStorage", "MemoryStorage"]
+
+
+import io
+import os
+import secrets
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Lock
+from typing import Any, Counter, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .bundle import SnapshotBundles
+from .format import Fmt
+from .utils import (
+    atomic_path,
+    content_digest,
+    file_digest,
+    format_size,
+    fsync_path,
+    link_path,
+    path_size,
+    pluralize,
+    read_members,
+    readonly_path,
+    remove_path,
+    rename_path,
+    replace_path,
+    write_members,
+)
+
+OBJECTS_DIRECTORY = ".objects"
+
+
+def load_members(path: Path, fmt: Fmt[Any], members: Dict[str, bytes]) -> Any:
+    if list(members) == [""]:
+        with suppress(NotImplementedError):
+            return fmt.deserialize(members[""])
+        return fmt.load_file(io.BytesIO(members[""]))
+
+    with TemporaryDirectory() as directory:
+        tmp = Path(directory, path.name)
+        write_members(tmp, members)
+        return fmt.load(tmp)
+
+
+class SnapshotStorage:
+    def list(self, directory: Path) -> List[str]:
+        raise NotImplementedError()
+
+    def walk(self, root: Path) -> Iterator[Path]:
+        raise NotImplementedError()
+
+    def exists(self, path: Path) -> bool:
+        raise NotImplementedError()
+
+    def read(self, path: Path) -> Dict[str, bytes]:
+        raise NotImplementedError()
+
+    def write(self, path: Path, members: Dict[str, bytes]):
+        raise NotImplementedError()
+
+    def delete(self, path: Path):
+        raise NotImplementedError()
+
+    def move(self, src: Path, dst: Path):
+        self.write(dst, self.read(src))
+        self.delete(src)
+
+    def read_many(self, paths: Iterable[Path]) -> Dict[Path, Dict[str, bytes]]:
+        return {path: self.read(path) for path in paths}
+
+    def write_many(self, snapshots: Dict[Path, Dict[str, bytes]]):
+        for path, members in snapshots.items():
+            self.write(path, members)
+
+    def move_many(self, moves: Dict[Path, Path]):
+        for src, dst in moves.items():
+            self.move(src, dst)
+
+    def delete_many(self, paths: Iterable[Path]):
+        for path in paths:
+            self.delete(path)
+
+    def stat(self, path: Path) -> Optional[Tuple[int, ...]]:
+        return None
+
+    def size(self, path: Path) -> int:
+        return sum(map(len, self.read(path).values()))
+
+    def digest(self, path: Path) -> str:
+        return content_digest(b"".join(self.read(path).values()))
+
+    def load(self, path: Path, fmt: Fmt[Any]) -> Any:
+        return load_members(path, fmt, self.read(path))
+
+    def dump(self, path: Path, fmt: Fmt[Any], value: Any) -> int:
+        try:
+            members = {"": fmt.serialize(value)}
+        except NotImplementedError:
+            with TemporaryDirectory() as directory:
+                tmp = Path(directory, path.name)
+                fmt.dump(tmp, value)
+                members = read_members(tmp)
+
+        self.write(path, members)
+        return sum(map(len, members.values()))
+
+    def compare(self, path: Path, fmt: Fmt[Any], value: Any) -> Optional[bool]:
+        try:
+            return True if self.read(path) == {"": fmt.serialize(value)} else None
+        except (NotImplementedError, TypeError):
+            return None
+
+    def flush(self):
+        pass
+
+    def export(self) -> Dict[str, Any]:
+        return {}
+
+    def merge(self, data: Dict[str, Any]):
+        pass
+
+    def summary(self) -> List[str]:
+        return []
+
+
+@dataclass
+class FileStorage(SnapshotStorage):
+    fsync: bool = False
+    bundles: SnapshotBundles = field(default_factory=SnapshotBundles)
+    directories: Set[Path] = field(default_factory=set[Path])
+
+    def mkdir(self, directory: Path):
+        if directory not in self.directories:
+            directory.mkdir(parents=True, exist_ok=True)
+            self.directories.add(directory)
+
+    def list(self, directory: Path) -> List[str]:
+        names: List[str] = []
+
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    path = directory / entry.name
+                    if self.bundles.is_bundle(path):
+                        names.extend(self.bundles[path].names)
+                    else:
+                        names.append(entry.name)
+        except FileNotFoundError:
+            pass
+
+        return names
+
+    def walk(self, root: Path) -> Iterator[Path]:
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            files = [name for name in files if not name.startswith(".")]
+
+            directory_snapshots = {
+                directory
+                for directory in dirs
+                if any(directory.endswith(extension) for extension in Fmt.registry)
+            }
+            dirs[:] = set(dirs) - directory_snapshots
+
+            for name in [*directory_snapshots, *files]:
+                path = Path(directory, name)
+                if self.bundles.is_bundle(path):
+                    for name in self.bundles[path].names:
+                        yield Path(directory, name)
+                else:
+                    yield path
+
+    def exists(self, path: Path) -> bool:
+        return bool(self.bundles.locate(path)) or path.exists()
+
+    def read(self, path: Path) -> Dict[str, bytes]:
+        if bundle := self.bundles.locate(path):
+            return bundle.read(path.name)
+        return read_members(path)
+
+    def write(self, path: Path, members: Dict[str, bytes]):
+        if self.bundles.target(path):
+            self.bundles.write(path, members)
+            return
+
+        self.mkdir(path.parent)
+        with atomic_path(path, self.fsync) as tmp:
+            write_members(tmp, members)
+
+    def delete(self, path: Path):
+        self.bundles.delete(path)
+        remove_path(path)
+
+    def move(self, src: Path, dst: Path):
+        self.move_many({src: dst})
+
+    def move_many(self, moves: Dict[Path, Path]):
+        for src, dst in moves.items():
+            if self.bundles.locate(src) or self.bundles.target(dst):
+                super().move(src, dst)
+                continue
+
+            self.mkdir(dst.parent)
+
+            # Renaming in place is atomic and avoids removing the previous
+            # snapshot first, but it doesn't work across filesystems.
+            try:
+                os.replace(src, dst)
+            except OSError:
+                rename_path(src, dst)
+
+    def stat(self, path: Path) -> Optional[Tuple[int, ...]]:
+        if self.bundles.locate(path):
+            return None
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def size(self, path: Path) -> int:
+        if self.bundles.locate(path):
+            return super().size(path)
+        return path_size(path)
+
+    def digest(self, path: Path) -> str:
+        if self.bundles.locate(path) or path.is_dir():
+            return super().digest(path)
+        return file_digest(path)
+
+    def load(self, path: Path, fmt: Fmt[Any]) -> Any:
+        if self.bundles.locate(path):
+            return super().load(path, fmt)
+        return fmt.load(path)
+
+    def dump(self, path: Path, fmt: Fmt[Any], value: Any) -> int:
+        if self.bundles.target(path):
+            return super().dump(path, fmt, value)
+
+        self.mkdir(path.parent)
+        fmt.dump_atomic(path, value, self.fsync)
+        return path_size(path)
+
+    def compare(self, path: Path, fmt: Fmt[Any], value: Any) -> Optional[bool]:
+        if self.bundles.locate(path):
+            return super().compare(path, fmt, value)
+        return fmt.compare(path, value)
+
+    def flush(self):
+        self.bundles.flush()
+
+
+@dataclass
+class DedupStorage(FileStorage):
+    cache_limit: int = 1 << 28
+    cache: Dict[Tuple[int, int, int, int], bytes] = field(
+        default_factory=dict[Tuple[int, int, int, int], bytes]
+    )
+    stores: Set[Path] = field(default_factory=set[Path])
+    cache_size: int = 0
+    stats: Counter[str] = field(default_factory=Counter[str])
+    lock: Lock = field(default_factory=Lock)
+
+    def store(self, directory: Path) -> Path:
+        objects = directory / OBJECTS_DIRECTORY
+
+        if objects not in self.stores:
+            self.mkdir(objects)
+            gitignore = objects / ".gitignore"
+            if not gitignore.exists():
+                gitignore.write_text("*\n")
+            self.stores.add(objects)
+
+        return objects
+
+    def load(self, path: Path, fmt: Fmt[Any]) -> Any:
+        if self.bundles.locate(path):
+            return super().load(path, fmt)
+
+        # Deduplicated snapshots are hardlinks to the same object so the inode
+        # identifies the content without reading the file.
+        info = os.stat(path)
+        if info.st_nlink < 2 or path.is_dir():
+            return fmt.load(path)
+
+        key = info.st_dev, info.st_ino, info.st_mtime_ns, info.st_size
+
+        if (data := self.cache.get(key)) is not None:
+            with self.lock:
+                self.stats["cached"] += 1
+        else:
+            data = path.read_bytes()
+            with self.lock:
+                if self.cache_size + len(data) <= self.cache_limit:
+                    self.cache[key] = data
+                    self.cache_size += len(data)
+
+        return fmt.load_file(io.BytesIO(data))
+
+    def dump(self, path: Path, fmt: Fmt[Any], value: Any) -> int:
+        if self.bundles.target(path):
+            return super().dump(path, fmt, value)
+
+        objects = self.store(path.parent)
+        tmp = objects / f".{secrets.token_hex(4)}.{path.name}"
+
+        try:
+            fmt.dump(tmp, value)
+
+            if self.fsync:
+                fsync_path(tmp)
+
+            if tmp.is_dir():
+                size = path_size(tmp)
+                replace_path(tmp, path)
+                return size
+
+            size = tmp.stat().st_size
+            obj = objects / file_digest(tmp)
+
+            # New objects only appear in the store once the snapshot links to
+            # them so other processes never collect them as unused.
+            with atomic_path(path, self.fsync) as link:
+                try:
+                    link_path(obj, link)
+                except FileNotFoundError:
+                    link_path(tmp, link)
+                    with suppress(OSError):
+                        os.link(tmp, obj)
+                        with self.lock:
+                            self.stats["objects"] += 1
+                else:
+                    with self.lock:
+                        self.stats["deduplicated"] += 1
+                        self.stats["saved"] += size
+
+                # Linked snapshots share their content so they're made read-only
+                # to prevent editing one of them from changing all the others.
+                readonly_path(link)
+
+            return size
+        finally:
+            remove_path(tmp)
+
+    def delete(self, path: Path):
+        super().delete(path)
+        if (objects := path.parent / OBJECTS_DIRECTORY).is_dir():
+            self.stores.add(objects)
+
+    def flush(self):
+        super().flush()
+
+        # Objects that aren't linked from any snapshot anymore are removed
+        # from the stores that were used during the session.
+        for objects in self.stores:
+            with suppress(FileNotFoundError), os.scandir(objects) as entries:
+                for entry in entries:
+                    if not entry.name.startswith(".") and entry.stat().st_nlink < 2:
+                        remove_path(objects / entry.name)
+
+    def export(self) -> Dict[str, Any]:
+        return {"stats": dict(self.stats), "stores": [str(s) for s in self.stores]}
+
+    def merge(self, data: Dict[str, Any]):
+        self.stats.update(data.get("stats", {}))
+        self.stores.update(map(Path, data.get("stores", [])))
+
+    def summary(self) -> List[str]:
+        lines: List[str] = []
+
+        if deduplicated := self.stats["deduplicated"]:
+            lines.append(
+                pluralize("snapshot", deduplicated)
+                + f" deduplicated into {pluralize('object', self.stats['objects'])}"
+                + f" ({format_size(self.stats['saved'])} saved)"
+            )
+        if cached := self.stats["cached"]:
+            lines.append(pluralize("snapshot", cached) + " loaded from the dedup cache")
+
+        return lines
+
+
+@dataclass
+class MemoryStorage(SnapshotStorage):
+    snapshots: Dict[Path, Dict[str, bytes]] = field(
+        default_factory=dict[Path, Dict[str, bytes]]
+    )
+
+    def list(self, directory: Path) -> List[str]:
+        return [path.name for path in [*self.snapshots] if path.parent == directory]
+
+    def walk(self, root: Path) -> Iterator[Path]:
+        return iter([path for path in [*self.snapshots] if root in path.parents])
+
+    def exists(self, path: Path) -> bool:
+        return path in self.snapshots
+
+    def read(self, path: Path) -> Dict[str, bytes]:
+        if (members := self.snapshots.get(path)) is None:
+            raise FileNotFoundError(f"{str(path)!r} not found")
+        return dict(members)
+
+    def write(self, path: Path, members: Dict[str, bytes]):
+        self.snapshots[path] = dict(members)
+
+    def delete(self, path: Path):
+        for snapshot in [path, *self.walk(path)]:
+            self.snapshots.pop(snapshot, None)
@@ -1,56 +1,161 @@
 __all__ = [
     "normalize_node_name",
     "node_path_name",
+    "snapshot_prefixes",
+    "content_digest",
+    "file_digest",
+    "mapped_equal",
     "hexdump",
     "hexload",
     "is_ci",
     "pluralize",
+    "format_size",
+    "path_size",
+    "read_members",
+    "write_members",
     "remove_path",
     "rename_path",
+    "link_path",
+    "readonly_path",
+    "replace_path",
+    "fsync_path",
+    "atomic_path",
+    "locked_path",
 ]
 
 
+import errno
+import hashlib
 import math
+import mmap
 import os
 import re
+import secrets
 import shutil
+import stat
+import struct
+import time
+from contextlib import contextmanager, suppress
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Iterator, Tuple
+from typing import Any, Dict, Iterator, List, Tuple
 
 from _pytest import python
+from pytest import StashKey
+
+
+NODE_NAME_AFFIXES = re.compile(r"^(tests?[_/])*|([_/]tests?)*(\.\w+)?$")
+NODE_NAME_SEPARATORS = re.compile(r"\W+")
+NODE_PATH_NAME = StashKey[Tuple[Path, str]]()
+
+REPLACE_ERRORS = {errno.EEXIST, errno.EISDIR, errno.ENOTDIR, errno.ENOTEMPTY}
 
 
 def normalize_node_name(name: str) -> str:
-    return re.sub(
-        r"\W+", "_", re.sub(r"^(tests?[_/])*|([_/]tests?)*(\.\w+)?$", "", name)
-    ).strip("_")
+    return NODE_NAME_SEPARATORS.sub("_", NODE_NAME_AFFIXES.sub("", name)).strip("_")
 
 
 def node_path_name(node: Any) -> Tuple[Path, str]:
-    hierarchy = [normalize_node_name(node.name)]
+    if isinstance(node, python.Module):
+        path = Path(node.fspath)  # type: ignore
+        directory = resolve_directory(os.getcwd())
+        return path.relative_to(directory), normalize_node_name(node.name)
 
-    while not isinstance(node, python.Module):
-        node = node.parent
-        hierarchy.append(normalize_node_name(node.name))
+    # Parametrized tests share their parents so the names of modules and
+    # classes are only normalized once per session.
+    parent = node.parent
+    if (cached := parent.stash.get(NODE_PATH_NAME, None)) is None:
+        cached = parent.stash[NODE_PATH_NAME] = node_path_name(parent)
 
-    path = Path(node.fspath)  # type: ignore
+    path, prefix = cached
+    return path, f"{prefix}__{normalize_node_name(node.name)}"
 
-    return (
-        path.relative_to(Path(".").resolve()),
-        "__".join(reversed(hierarchy)),
-    )
+
+@lru_cache(maxsize=None)
+def resolve_directory(directory: str) -> Path:
+    return Path(directory).resolve()
+
+
+def snapshot_prefixes(name: str) -> Iterator[str]:
+    i = name.find("__")
+    while i >= 0:
+        yield name[:i]
+        i = name.find("__", i + 1)
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(
+            f, lambda: hashlib.blake2b(digest_size=16)
+        ).hexdigest()
+
+
+def mapped_equal(path: Path, data: Any, chunk_size: int = 1 << 20) -> bool:
+    view = memoryview(data).cast("B")
+
+    with path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size != view.nbytes:
+            return False
+        if not view.nbytes:
+            return True
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return all(
+                mapped[i : i + chunk_size] == view[i : i + chunk_size]
+                for i in range(0, view.nbytes, chunk_size)
+            )
+
+
+HEXDUMP_PRINTABLE = bytes(i if 32 <= i < 127 else ord(".") for i in range(256))
 
 
 def hexdump(data: bytes, n: int = 16) -> Iterator[str]:
-    for k, i in enumerate(range((len(data) + n - 1) // n)):
-        values = data[i * n : (i + 1) * n]
-        line = values.hex(b" ", -2)
-        suffix = "".join(chr(i) if 32 <= i < 127 else "." for i in values)
-        yield f"{k * n:08x}:  {line:{math.ceil(n * 2.5)}} {suffix}"
+    data = bytes(data)
+    width = math.ceil(n * 2.5)
+    full = len(data) // n if n % 2 == 0 and len(data) <= 1 << 32 else 0
+
+    if full:
+        yield from hexdump_block(data[: full * n], n, width)
+
+    for i in range(full * n, len(data), n):
+        values = data[i : i + n]
+        line = values.hex(" ", -2)
+        suffix = values.translate(HEXDUMP_PRINTABLE).decode("ascii")
+        yield f"{i:08x}:  {line:{width}} {suffix}"
+
+
+def hexdump_block(data: bytes, n: int, width: int) -> List[str]:
+    # All the lines have the same layout so instead of formatting them one by
+    # one, each column is filled for every line at once with a strided slice.
+    count = len(data) // n
+    stride = 13 + width + n
+    block = bytearray(b" ") * (count * stride)
+
+    offsets = struct.pack(f">{count}I", *range(0, len(data), n)).hex().encode()
+    for c in range(8):
+        block[c::stride] = offsets[c::8]
+    block[8::stride] = b":" * count
+
+    hexed = data.hex().encode()
+    for c in range(2 * n):
+        block[11 + c + c // 4 :: stride] = hexed[c :: 2 * n]
+
+    printable = data.translate(HEXDUMP_PRINTABLE)
+    for c in range(n):
+        block[12 + width + c :: stride] = printable[c::n]
+
+    block[stride - 1 :: stride] = b"\n" * count
+    return block[:-1].decode("ascii").split("\n")
 
 
 def hexload(dump: str) -> bytes:
-    return b"".join(bytes.fromhex(line.split("  ")[1]) for line in dump.splitlines())
+    return bytes.fromhex(
+        " ".join(line.split("  ", 2)[1] for line in dump.splitlines() if line)
+    )
 
 
 def is_ci() -> bool:
@@ -61,6 +166,37 @@ def pluralize(word: str, count: int) -> str:
     return f"{count} {word}" + "s" * (count > 1)
 
 
+def format_size(size: float) -> str:
+    for unit in ["B", "KiB", "MiB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def path_size(path: Path) -> int:
+    if path.is_dir():
+        return sum(path_size(child) for child in path.iterdir())
+    return path.stat().st_size
+
+
+def read_members(path: Path) -> Dict[str, bytes]:
+    if not path.is_dir():
+        return {"": path.read_bytes()}
+    return {
+        child.relative_to(path).as_posix(): child.read_bytes()
+        for child in sorted(path.rglob("*"))
+        if child.is_file()
+    }
+
+
+def write_members(path: Path, members: Dict[str, bytes]):
+    for member, data in members.items():
+        target = path / member if member else path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+
+
 def remove_path(path: Path):
     if path.is_dir():
         shutil.rmtree(path)
@@ -71,3 +207,98 @@ def remove_path(path: Path):
 def rename_path(src: Path, dst: Path):
     remove_path(dst)
     shutil.move(str(src), dst)
+
+
+def link_path(src: Path, dst: Path):
+    try:
+        os.link(src, dst)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def readonly_path(path: Path):
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    os.chmod(path, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def replace_path(src: Path, dst: Path, attempts: int = 10):
+    for _ in range(attempts - 1):
+        try:
+            os.replace(src, dst)
+            return
+        except OSError as exc:
+            if exc.errno not in REPLACE_ERRORS or not (src.is_dir() or dst.is_dir()):
+                raise
+
+        # Directories can't replace existing paths so the destination needs to
+        # be moved out of the way first, which might race with other writers.
+        stale = dst.with_name(f".{dst.name}.{secrets.token_hex(4)}.old")
+        with suppress(FileNotFoundError):
+            os.replace(dst, stale)
+        remove_path(stale)
+
+    os.replace(src, dst)
+
+
+def fsync_path(path: Path):
+    if path.is_dir():
+        for child in path.iterdir():
+            fsync_path(child)
+        if os.name != "posix":
+            return
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_path(path: Path, fsync: bool = False) -> Iterator[Path]:
+    tmp = path.with_name(f".{secrets.token_hex(4)}.{path.name}")
+
+    try:
+        yield tmp
+
+        if not os.path.lexists(tmp):
+            raise FileNotFoundError(f"{str(tmp)!r} not found")
+
+        if fsync:
+            fsync_path(tmp)
+
+        replace_path(tmp, path)
+
+        if fsync and os.name == "posix":
+            fd = os.open(path.parent, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    finally:
+        remove_path(tmp)
+
+
+@contextmanager
+def locked_path(path: Path, timeout: float = 30) -> Iterator[None]:
+    lock = path.with_name(f".{path.name}.lock")
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            # Locks left behind by interrupted runs are eventually ignored.
+            if time.monotonic() > deadline:
+                lock.unlink(missing_ok=True)
+                deadline = time.monotonic() + timeout
+            time.sleep(0.01)
+
+    try:
+        yield
+    finally:
+        os.close(fd)
+        lock.unlink(missing_ok=True)
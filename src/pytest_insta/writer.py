@@ -0,0 +1,65 @@
+__all__ = ["SnapshotWriter"]
+
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import BoundedSemaphore
+from typing import Any, Dict, List, Optional, Tuple
+
+from .format import Fmt
+from .profile import SnapshotProfile
+from .storage import FileStorage, SnapshotStorage
+
+
+@dataclass
+class SnapshotWriter:
+    workers: int = 0
+    storage: SnapshotStorage = field(default_factory=FileStorage)
+    profile: SnapshotProfile = field(default_factory=SnapshotProfile)
+    executor: Optional[ThreadPoolExecutor] = field(init=False, default=None)
+    slots: BoundedSemaphore = field(init=False)
+    pending: Dict[Path, Tuple[str, "Future[None]"]] = field(
+        default_factory=dict[Path, Tuple[str, "Future[None]"]]
+    )
+    errors: List[Tuple[Path, str, str]] = field(
+        default_factory=list[Tuple[Path, str, str]]
+    )
+
+    def __post_init__(self):
+        self.slots = BoundedSemaphore(max(self.workers, 1) * 4)
+        if self.workers:
+            self.executor = ThreadPoolExecutor(self.workers, "insta-writer")
+
+    def submit(self, nodeid: str, path: Path, fmt: Fmt[Any], value: Any):
+        if not self.executor:
+            self.dump(nodeid, path, fmt, value)
+            return
+
+        self.wait(path)
+        self.slots.acquire()
+
+        future = self.executor.submit(self.dump, nodeid, path, fmt, value)
+        future.add_done_callback(lambda _: self.slots.release())
+        self.pending[path] = nodeid, future
+
+    def dump(self, nodeid: str, path: Path, fmt: Fmt[Any], value: Any):
+        with self.profile.measure(nodeid, "dump") as counters:
+            counters["dump_bytes"] += self.storage.dump(path, fmt, value)
+
+    def wait(self, path: Path):
+        if not (pending := self.pending.pop(path, None)):
+            return
+
+        nodeid, future = pending
+
+        if exc := future.exception():
+            self.errors.append((path, nodeid, f"{type(exc).__name__}: {exc}"))
+
+    def drain(self):
+        for path in list(self.pending):
+            self.wait(path)
+
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,137 @@
+from typing import Dict
+from zipfile import ZipFile
+
+import pytest
+from pytest import Pytester
+
+
+def bundle_contents(pytester: Pytester) -> Dict[str, bytes]:
+    with ZipFile(pytester.path / "snapshots" / "t.zip") as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def test_bundle(pytester: Pytester):
+    pytester.makepyfile(
+        test_t="""
+        def test_a(snapshot):
+            assert snapshot() == "hello"
+            assert snapshot("json") == {"a": 1}
+
+        def test_b(snapshot):
+            assert snapshot("hexdump") == b"abc"
+        """
+    )
+
+    pytester.runpytest("--insta=record", "--insta-bundle").assert_outcomes(passed=2)
+    assert sorted(p.name for p in (pytester.path / "snapshots").iterdir()) == ["t.zip"]
+    contents = bundle_contents(pytester)
+    assert sorted(contents) == ["t__a__0.txt", "t__a__1.json", "t__b__0.hexdump"]
+    assert contents["t__a__0.txt"] == b"hello"
+
+    pytester.runpytest("--insta=update-none").assert_outcomes(passed=2)
+
+    pytester.makepyfile(
+        test_t="""
+        def test_a(snapshot):
+            assert snapshot() == "world"
+
+        def test_b(snapshot):
+            assert snapshot("hexdump") == b"abc"
+        """
+    )
+
+    result = pytester.runpytest("--insta=update-none")
+    result.assert_outcomes(failed=1, passed=1)
+
+    result = pytester.runpytest("--insta=update")
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(
+        ["UPDATE snapshots/t__a__0.txt", "DELETE snapshots/t__a__1.json"]
+    )
+    contents = bundle_contents(pytester)
+    assert sorted(contents) == ["t__a__0.txt", "t__b__0.hexdump"]
+    assert contents["t__a__0.txt"] == b"world"
+
+    pytester.makepyfile(
+        test_t="""
+        def test_a(snapshot):
+            pass
+
+        def test_b(snapshot):
+            pass
+        """
+    )
+    pytester.runpytest("--insta=update").assert_outcomes(passed=2)
+    assert not (pytester.path / "snapshots" / "t.zip").exists()
+
+
+def test_bundle_migration(pytester: Pytester):
+    pytester.makepyfile(
+        test_t="""
+        def test_a(snapshot):
+            assert snapshot() == "hello"
+            assert snapshot() == "world"
+        """
+    )
+    pytester.runpytest("--insta=record").assert_outcomes(passed=1)
+
+    pytester.makepyfile(
+        test_t="""
+        def test_a(snapshot):
+            assert snapshot() == "hello"
+            assert snapshot() == "updated"
+        """
+    )
+
+    pytester.runpytest("--insta=update", "--insta-bundle").assert_outcomes(passed=1)
+    assert sorted(p.name for p in (pytester.path / "snapshots").iterdir()) == [
+        "t.zip",
+        "t__a__0.txt",
+    ]
+    assert bundle_contents(pytester) == {"t__a__1.txt": b"updated"}
+
+    pytester.runpytest("--insta=update-none").assert_outcomes(passed=1)
+
+
+def test_bundle_xdist(pytester: Pytester):
+    pytest.importorskip("xdist")
+
+    pytester.makepyfile(
+        test_t="""
+        import pytest
+
+        @pytest.mark.parametrize("i", range(8))
+        def test_a(snapshot, i):
+            assert snapshot() == str(i)
+        """
+    )
+
+    result = pytester.runpytest("--insta=record", "--insta-bundle", "-n", "2")
+    result.assert_outcomes(passed=8)
+    assert bundle_contents(pytester) == {
+        f"t__a_{i}__0.txt": str(i).encode() for i in range(8)
+    }
+
+    pytester.runpytest("--insta=update-none", "-n", "2").assert_outcomes(passed=8)
+
+
+def test_bundle_review(pytester: Pytester):
+    pytester.makepyfile(
+        test_t="""
+        def test_a(snapshot):
+            assert snapshot() == "hello"
+        """
+    )
+    pytester.runpytest("--insta=record", "--insta-bundle").assert_outcomes(passed=1)
+
+    pytester.makepyfile(
+        test_t="""
+        def test_a(snapshot):
+            assert snapshot() == "world"
+        """
+    )
+
+    result = pytester.runpytest("--insta=review", "--insta-bundle", "--insta-accept=*")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["UPDATE snapshots/t__a__0.txt"])
+    assert bundle_contents(pytester) == {"t__a__0.txt": b"world"}
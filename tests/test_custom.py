@@ -2,7 +2,10 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Tuple
 
-from pytest_insta import Fmt
+import pytest
+from pytest import Pytester
+
+from pytest_insta import Fmt, FmtJson
 
 
 @dataclass
@@ -40,3 +43,109 @@ class FmtTextPair(Fmt[Tuple[str, str]]):
 
 def test_text_dir(snapshot: Any):
     assert snapshot("textpair") == ("hello", "world")
+
+
+@pytest.fixture
+def fmt_registry(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(Fmt, "registry", dict(Fmt.registry))
+    monkeypatch.setattr(Fmt, "specs", dict(Fmt.specs))
+    monkeypatch.setattr(Fmt, "instances", dict(Fmt.instances))
+
+
+@pytest.mark.usefixtures("fmt_registry")
+def test_late_format():
+    assert Fmt.from_spec("late") == (None, None)
+
+    class FmtLate(FmtTextPair):
+        extension = ".late"
+
+    name, fmt = Fmt.from_spec("foo.late")
+    assert name == "foo.late" and isinstance(fmt, FmtLate)
+    assert Fmt.from_spec("late")[1] is fmt
+
+
+class FmtSortedJson(FmtJson):
+    extension = ".sorted.json"
+    canonical = True
+
+
+def test_sorted_json(snapshot: Any):
+    assert snapshot("sorted.json") == {"b": [1, 2], "a": {"d": None, "c": 0.5}}
+
+
+def test_dump_extension(pytester: Pytester):
+    pytester.makeconftest(
+        """
+        from pathlib import Path
+
+        from pytest_insta import Fmt
+
+        class FmtImage(Fmt[str]):
+            extension = ".img"
+
+            def load(self, path: Path) -> str:
+                assert path.suffix == ".img"
+                return path.read_text()
+
+            def dump(self, path: Path, value: str):
+                assert path.suffix == ".img"
+                path.write_text(value)
+        """
+    )
+    pytester.makepyfile(
+        test_t="""
+        def test_t(snapshot):
+            assert snapshot("img") == "hello"
+        """
+    )
+
+    path = pytester.path / "snapshots" / "t__t__0.img"
+
+    pytester.runpytest("--insta=record").assert_outcomes(passed=1)
+    pytester.runpytest("--insta=update-none").assert_outcomes(passed=1)
+    assert path.read_text() == "hello"
+
+    path.unlink()
+    pytester.runpytest("--insta=record", "--insta-dedup").assert_outcomes(passed=1)
+    assert path.read_text() == "hello"
+
+
+def test_dump_nothing(pytester: Pytester):
+    pytester.makeconftest(
+        """
+        from pathlib import Path
+
+        from pytest_insta import FmtText
+
+        class FmtNothing(FmtText):
+            extension = ".nothing"
+
+            def dump(self, path: Path, value: str):
+                if value != "broken":
+                    super().dump(path, value)
+        """
+    )
+    pytester.makepyfile(
+        test_t="""
+        def test_t(snapshot):
+            assert snapshot("nothing") == "hello"
+        """
+    )
+    path = pytester.path / "snapshots" / "t__t__0.nothing"
+
+    pytester.runpytest("--insta=record").assert_outcomes(passed=1)
+    pytester.makepyfile(
+        test_t="""
+        def test_t(snapshot):
+            assert snapshot("nothing") == "broken"
+        """
+    )
+
+    result = pytester.runpytest("--insta=update")
+    assert result.ret != 0
+    assert path.read_text() == "hello"
+    assert sorted(p.name for p in path.parent.iterdir()) == [path.name]
+
+
+def test_late_format_removed():
+    assert Fmt.from_spec("late") == (None, None)
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from typing import Any, List
+
+from pytest import Pytester
+
+from pytest_insta.diff import structural_diff
+
+
+@dataclass
+class Item:
+    name: str
+    tags: List[str]
+
+
+def test_structural_diff(snapshot: Any):
+    left = {"items": [Item(f"item{i}", ["a"]) for i in range(50)], "meta": {"v": 1}}
+    right = {"items": [Item(f"item{i}", ["a"]) for i in range(49)], "meta": {}}
+    right["items"][3] = Item("other", ["a", "b"])
+
+    assert snapshot() == "\n".join(structural_diff(left, right) or [])
+
+
+def test_structural_diff_limit(snapshot: Any):
+    left = list(range(100))
+    right = [-i for i in range(100)]
+
+    assert snapshot() == "\n".join(structural_diff(left, right, limit=3) or [])
+
+
+def test_structural_diff_small():
+    assert structural_diff({"a": 1}, {"a": 2}) is None
+    assert structural_diff(list(range(100)), list(range(100))) is None
+
+
+def test_large_mismatch(pytester: Pytester):
+    pytester.makeconftest(
+        """
+        calls = []
+
+        def pytest_assertrepr_compare(op, left, right):
+            calls.append(op)
+
+        def pytest_terminal_summary(terminalreporter):
+            terminalreporter.write_line(f"explanations: {len(calls)}")
+        """
+    )
+    pytester.makepyfile(
+        test_t="""
+        def test_t(snapshot):
+            assert snapshot("json") == {f"key{i}": i for i in range(2000)}
+        """
+    )
+    pytester.runpytest("--insta=record").assert_outcomes(passed=1)
+
+    pytester.makepyfile(
+        test_t="""
+        def test_t(snapshot):
+            assert snapshot("json") == {f"key{i}": -i for i in range(2000)}
+        """
+    )
+
+    result = pytester.runpytest("--insta=update-none")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*Showing the first 10 differences:"])
+    assert "['key1']: 1 != -1" in result.stdout.str()
+    result.stdout.fnmatch_lines(["explanations: 1"])
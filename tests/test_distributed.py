@@ -0,0 +1,128 @@
+import json
+
+import pytest
+from pytest import Pytester
+
+
+def test_shard_reconcile(pytester: Pytester):
+    pytester.makepyfile(
+        test_a="""
+        def test_a(snapshot):
+            assert snapshot() == "a"
+            assert snapshot() == "b"
+        """,
+        test_b="""
+        def test_b(snapshot):
+            assert snapshot() == "c"
+        """,
+    )
+    pytester.runpytest("--insta=update").assert_outcomes(passed=2)
+
+    pytester.makepyfile(
+        test_a="""
+        def test_a(snapshot):
+            assert snapshot() == "a"
+        """
+    )
+    path = pytester.path / "snapshots" / "a__a__1.txt"
+
+    result = pytester.runpytest("--insta=update", "--insta-shard=s1.json", "test_a.py")
+    result.assert_outcomes(passed=1)
+    result.stdout.no_fnmatch_line("DELETE *")
+    assert path.exists()
+
+    result = pytester.runpytest("--insta=update", "--insta-shard=s2.json", "test_b.py")
+    result.assert_outcomes(passed=1)
+
+    (pytester.path / "s3.json").write_text(
+        json.dumps({"stale": [], "used": ["snapshots/a__a__1.txt"]})
+    )
+    shards = [f"--insta-reconcile=s{i}.json" for i in range(1, 4)]
+    pytester.runpytest("--insta=update", *shards, "test_b.py").assert_outcomes(passed=1)
+    assert path.exists()
+
+    result = pytester.runpytest("--insta=update", *shards[:2], "test_b.py")
+    result.stdout.fnmatch_lines(["DELETE snapshots/a__a__1.txt"])
+    assert not path.exists()
+    assert (pytester.path / "snapshots" / "a__a__0.txt").exists()
+    assert (pytester.path / "snapshots" / "b__b__0.txt").exists()
+
+
+def test_xdist(pytester: Pytester):
+    pytest.importorskip("xdist")
+
+    pytester.makepyfile(
+        test_t="""
+        import pytest
+
+        @pytest.mark.parametrize("i", range(4))
+        def test_a(snapshot, i):
+            assert snapshot() == str(i)
+            assert snapshot() == "extra"
+        """
+    )
+
+    result = pytester.runpytest("--insta=update", "-n", "2")
+    result.assert_outcomes(passed=4)
+    assert result.stdout.str().count("SNAPSHOTS") == 1
+    result.stdout.fnmatch_lines_random(
+        [f"CREATE snapshots/t__a_{i}__{j}.txt" for i in range(4) for j in range(2)]
+    )
+
+    pytester.makepyfile(
+        test_t="""
+        import pytest
+
+        @pytest.mark.parametrize("i", range(4))
+        def test_a(snapshot, i):
+            assert snapshot() == str(-i)
+        """
+    )
+
+    result = pytester.runpytest("--insta=record", "-n", "2")
+    result.assert_outcomes(passed=4)
+    assert result.stdout.str().count("NOTICE 3 snapshots to review") == 1
+    result.stdout.fnmatch_lines_random(
+        [f"RECORD .pytest_cache/d/insta/t__a_{i}__0.txt" for i in range(1, 4)]
+        + [f"DELETE snapshots/t__a_{i}__1.txt" for i in range(4)]
+    )
+
+    result = pytester.runpytest("--insta=update", "-n", "2")
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines_random(
+        [f"UPDATE snapshots/t__a_{i}__0.txt" for i in range(1, 4)]
+    )
+    assert sorted(p.name for p in (pytester.path / "snapshots").iterdir()) == [
+        f"t__a_{i}__0.txt" for i in range(4)
+    ]
+
+
+def test_xdist_prefetch(pytester: Pytester):
+    pytest.importorskip("xdist")
+
+    pytester.makepyfile(
+        test_t="""
+        import pytest
+
+        @pytest.mark.parametrize("i", range(8))
+        def test_a(snapshot, i):
+            assert snapshot() == str(i)
+        """
+    )
+    pytester.runpytest("--insta=update").assert_outcomes(passed=8)
+
+    result = pytester.runpytest(
+        "--insta=update-none",
+        "--insta-prefetch=4",
+        "--insta-profile",
+        "-n",
+        "2",
+    )
+    result.assert_outcomes(passed=8)
+    result.stdout.no_fnmatch_line("*prefetched*")
+
+    result = pytester.runpytest(
+        "--insta=update-none", "--insta-prefetch=4", "--insta-profile"
+    )
+    result.assert_outcomes(passed=8)
+    result.stdout.fnmatch_lines(["*prefetched*"])
@@ -0,0 +1,39 @@
+from pytest import Pytester
+
+
+def test_read_only(pytester: Pytester):
+    pytester.makepyfile(
+        test_t="""
+        def test_t(snapshot):
+            assert snapshot("json") == {"items": [1, 2, 3]}
+
+        def test_u(snapshot):
+            assert snapshot() == "hello world"
+        """
+    )
+    pytester.runpytest("--insta=record").assert_outcomes(passed=2)
+
+    pytester.makepyfile(
+        test_t="""
+        import copy
+        import json
+        import pickle
+        import re
+
+        def test_t(snapshot):
+            value = snapshot("json")
+            assert value == {"items": [1, 2, 3]}
+            assert type(copy.copy(value)) is dict
+            assert copy.deepcopy(value) == {"items": [1, 2, 3]}
+            assert pickle.loads(pickle.dumps(value)) == {"items": [1, 2, 3]}
+            assert json.loads(json.dumps(value)) == value
+
+        def test_u(snapshot):
+            value = snapshot()
+            assert value == "hello world"
+            assert re.search("world", value)
+            assert " ".join([value, "!"]) == "hello world !"
+        """
+    )
+    pytester.runpytest("--insta=update-none").assert_outcomes(passed=2)
+    pytester.runpytest("--insta=update-new").assert_outcomes(passed=2)
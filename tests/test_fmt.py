@@ -1,7 +1,11 @@
+import math
 from dataclasses import asdict, dataclass
-from typing import Any
+from typing import Any, Iterator
 
 import pytest
+from pytest import Pytester
+
+from pytest_insta.utils import hexdump, hexload
 
 
 def test_text(snapshot: Any):
@@ -20,6 +24,34 @@ def test_hexdump(snapshot: Any):
     assert snapshot(".hexdump") == bytes(range(256))
 
 
+def reference_hexdump(data: bytes, n: int = 16) -> Iterator[str]:
+    for k, i in enumerate(range((len(data) + n - 1) // n)):
+        values = data[i * n : (i + 1) * n]
+        line = values.hex(b" ", -2)
+        suffix = "".join(chr(i) if 32 <= i < 127 else "." for i in values)
+        yield f"{k * n:08x}:  {line:{math.ceil(n * 2.5)}} {suffix}"
+
+
+def reference_hexload(dump: str) -> bytes:
+    return b"".join(bytes.fromhex(line.split("  ")[1]) for line in dump.splitlines())
+
+
+@pytest.mark.parametrize("n", [1, 2, 5, 7, 8, 16, 33])
+@pytest.mark.parametrize("size", [0, 1, 7, 16, 17, 255, 1000])
+def test_hexdump_reference(n: int, size: int):
+    data = (bytes(range(256)) * 4)[:size]
+    lines = list(reference_hexdump(data, n))
+    dump = "".join(f"{line}\n" for line in lines)
+
+    assert list(hexdump(data, n)) == lines
+    assert hexload(dump) == reference_hexload(dump) == data
+
+
+def test_buffer(snapshot: Any):
+    assert snapshot("bin") == bytearray(range(256))
+    assert snapshot("hexdump") == memoryview(bytes(range(256)))
+
+
 def test_json(snapshot: Any):
     assert snapshot("json") == {"foo": "yeah"}
     assert snapshot(".json") == {"foo": "yeah"}
@@ -50,3 +82,27 @@ def test_pickle_dataclass(snapshot: Any):
 def test_invalid_format(snapshot: Any, spec: str):
     with pytest.raises(ValueError, match="invalid snapshot format"):
         snapshot(spec)
+
+
+def test_compressed(snapshot: Any):
+    assert snapshot("txt.gz") == "hello\n" * 100
+    assert snapshot("hexdump.bz2") == bytes(range(256))
+    assert snapshot("json.xz") == {"foo": ["yeah"] * 100}
+    assert snapshot("pickle.gz") == Point(4, 5)
+    assert snapshot("report.json.gz") == {"foo": "yeah"}
+
+
+def test_crlf_text(pytester: Pytester):
+    pytester.makepyfile(
+        test_t='def test_t(snapshot):\n    assert snapshot() == "hello\\nworld\\n"\n'
+    )
+    path = pytester.path / "snapshots" / "t__t__0.txt"
+    path.parent.mkdir()
+    path.write_bytes(b"hello\r\nworld\r\n")
+
+    pytester.runpytest("--insta=update-none").assert_outcomes(passed=1)
+    pytester.runpytest("--insta=update-none", "--insta-prefetch=4").assert_outcomes(
+        passed=1
+    )
+    pytester.runpytest("--insta=update").assert_outcomes(passed=1)
+    assert path.read_bytes() == b"hello\r\nworld\r\n"
@@ -0,0 +1,64 @@
+import json
+from typing import List
+
+import pytest
+from pytest import Pytester
+
+TESTS = """
+import pytest
+
+@pytest.mark.parametrize("i", range(4))
+def test_a(snapshot, i):
+    assert snapshot() == str(i)
+    assert snapshot("json") == {"i": i}
+"""
+
+NODEIDS = [f"test_t.py::test_a[{i}]" for i in range(4)]
+
+
+def test_profile_json(pytester: Pytester):
+    pytester.makepyfile(test_t=TESTS)
+    pytester.runpytest("--insta=update").assert_outcomes(passed=4)
+
+    result = pytester.runpytest("--insta=update", "--insta-profile-json=profile.json")
+    result.assert_outcomes(passed=4)
+
+    profile = json.loads((pytester.path / "profile.json").read_text())
+    assert sorted(profile) == ["tests", "total"]
+    assert sorted(profile["tests"]) == NODEIDS
+
+    for counters in profile["tests"].values():
+        assert counters["compare"] == 2
+        assert counters["flush"] == 1
+        assert {"compare_time", "flush_time"} <= counters.keys()
+
+    assert profile["total"]["compare"] == 8
+    assert profile["total"]["flush"] == 4
+
+
+@pytest.mark.parametrize("args", [[], ["-n", "2"]], ids=["serial", "xdist"])
+def test_profile_hook(pytester: Pytester, args: List[str]):
+    if args:
+        pytest.importorskip("xdist")
+
+    pytester.makeconftest(
+        """
+        import json
+
+        def pytest_insta_profile(config, profile):
+            with open(config.rootpath / "hook.json", "a") as f:
+                f.write(json.dumps(profile.export()) + "\\n")
+        """
+    )
+    pytester.makepyfile(test_t=TESTS)
+    pytester.runpytest("--insta=update").assert_outcomes(passed=4)
+    (pytester.path / "hook.json").unlink()
+
+    result = pytester.runpytest("--insta=update", *args)
+    result.assert_outcomes(passed=4)
+
+    # The hook only runs once the profiles of all the workers are merged.
+    [line] = (pytester.path / "hook.json").read_text().splitlines()
+    profile = json.loads(line)
+    assert sorted(profile["tests"]) == NODEIDS
+    assert profile["total"]["compare"] == 8
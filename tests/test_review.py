@@ -0,0 +1,134 @@
+import json
+import sys
+from typing import Any, Dict
+
+import pytest
+from pytest import Pytester
+
+
+def write_tests(pytester: Pytester, text: str, data: Dict[str, Any]):
+    pytester.makepyfile(
+        test_t=f"""
+        def test_a(snapshot):
+            assert snapshot() == {text!r}
+
+        def test_b(snapshot):
+            assert snapshot("json") == {data!r}
+        """
+    )
+
+
+@pytest.fixture
+def recorded(pytester: Pytester) -> Pytester:
+    write_tests(pytester, "hello", {"a": 1})
+    pytester.runpytest("--insta=update").assert_outcomes(passed=2)
+    write_tests(pytester, "world", {"a": 2})
+    pytester.runpytest("--insta=record").assert_outcomes(passed=2)
+    return pytester
+
+
+def test_review_export(recorded: Pytester):
+    result = recorded.runpytest("--insta=review-only", "--insta-review-export=r.json")
+    result.stdout.fnmatch_lines(["NOTICE 2 snapshots to review"])
+
+    reviews = json.loads((recorded.path / "r.json").read_text())["reviews"]
+    assert [review["nodeid"] for review in reviews] == [
+        "test_t.py::test_a",
+        "test_t.py::test_b",
+    ]
+    assert reviews[0]["snapshot"] == "snapshots/t__a__0.txt"
+    assert reviews[0]["summary"][0] == "assert 'hello' == 'world'"
+    assert all(review["decision"] is None for review in reviews)
+
+    assert (recorded.path / "snapshots" / "t__a__0.txt").read_text() == "hello"
+
+
+def test_review_accept_reject(recorded: Pytester):
+    result = recorded.runpytest(
+        "--insta=review-only",
+        "--insta-accept=test_t.py::test_a",
+        "--insta-reject=*.json",
+    )
+    result.stdout.fnmatch_lines(
+        ["REJECT .pytest_cache/d/insta/t__b__0.json", "UPDATE snapshots/t__a__0.txt"]
+    )
+
+    assert (recorded.path / "snapshots" / "t__a__0.txt").read_text() == "world"
+    recorded.runpytest("--insta=update-none").assert_outcomes(passed=1, failed=1)
+
+    result = recorded.runpytest("--insta=review-only", "--insta-review-export=r.json")
+    result.stdout.no_fnmatch_line("NOTICE * to review")
+
+
+def test_review_decisions(recorded: Pytester):
+    recorded.runpytest("--insta=review-only", "--insta-review-export=r.json")
+
+    path = recorded.path / "r.json"
+    data = json.loads(path.read_text())
+    data["reviews"][0]["decision"] = "skip"
+    data["reviews"][1]["decision"] = "accept"
+    path.write_text(json.dumps(data))
+
+    result = recorded.runpytest("--insta=review-only", "--insta-decisions=r.json")
+    result.stdout.fnmatch_lines(
+        ["UPDATE snapshots/t__b__0.json", "NOTICE 1 snapshot to review"]
+    )
+
+    data["reviews"][0]["decision"] = "reject"
+    path.write_text(json.dumps(data))
+
+    result = recorded.runpytest("--insta=review-only", "--insta-decisions=r.json")
+    result.stdout.fnmatch_lines(["REJECT .pytest_cache/d/insta/t__a__0.txt"])
+    assert (recorded.path / "snapshots" / "t__a__0.txt").read_text() == "hello"
+
+
+def test_review_decisions_stale(recorded: Pytester):
+    recorded.runpytest("--insta=review-only", "--insta-review-export=r.json")
+
+    path = recorded.path / "r.json"
+    data = json.loads(path.read_text())
+    for review in data["reviews"]:
+        review["decision"] = "accept"
+    path.write_text(json.dumps(data))
+
+    write_tests(recorded, "again", {"a": 2})
+    recorded.runpytest("--insta=record").assert_outcomes(passed=2)
+
+    result = recorded.runpytest("--insta=review-only", "--insta-decisions=r.json")
+    result.stdout.fnmatch_lines(
+        ["UPDATE snapshots/t__b__0.json", "NOTICE 1 snapshot to review"]
+    )
+    assert (recorded.path / "snapshots" / "t__a__0.txt").read_text() == "hello"
+
+
+def test_review_interactive(recorded: Pytester):
+    recorded.makeconftest(
+        """
+        import threading
+
+        threads = set()
+
+        def pytest_assertrepr_compare(op, left, right):
+            threads.add(threading.current_thread() is threading.main_thread())
+
+        def pytest_terminal_summary(terminalreporter):
+            terminalreporter.write_line(f"main thread: {threads}")
+        """
+    )
+    result = recorded.run(
+        sys.executable, "-m", "pytest", "--insta=review-only", stdin=b"a\nr\n"
+    )
+    result.stdout.fnmatch_lines(
+        [
+            "*[[]1/2[]]*",
+            "old: snapshots/t__a__0.txt",
+            "*accepting snapshot",
+            "*[[]2/2[]]*",
+            "old: snapshots/t__b__0.json",
+            "*rejecting snapshot",
+            "main thread: {True}",
+            "REJECT .pytest_cache/d/insta/t__b__0.json",
+            "UPDATE snapshots/t__a__0.txt",
+        ]
+    )
+    assert (recorded.path / "snapshots" / "t__a__0.txt").read_text() == "world"
@@ -0,0 +1,160 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+from pytest import Pytester
+
+from pytest_insta import Fmt, MemoryStorage
+from pytest_insta.prefetch import SnapshotPrefetcher
+
+
+def test_memory_storage(snapshot: Any):
+    storage = MemoryStorage()
+    _, fmt = Fmt.from_spec(".json")
+    assert fmt
+
+    path = Path("snapshots/mod__test__0.json")
+    storage.dump(path, fmt, {"items": [1, 2, 3]})
+    storage.move(path, path.with_name("mod__test__1.json"))
+
+    assert storage.list(Path("snapshots")) == ["mod__test__1.json"]
+    assert storage.load(path.with_name("mod__test__1.json"), fmt) == {
+        "items": [1, 2, 3]
+    }
+    assert snapshot("json") == storage.load(path.with_name("mod__test__1.json"), fmt)
+
+    storage.delete(Path("snapshots"))
+    assert not storage.exists(path.with_name("mod__test__1.json"))
+
+
+def test_dedup_storage(pytester: Pytester):
+    pytester.makepyfile(
+        test_t="""
+        import pytest
+
+        @pytest.mark.parametrize("i", range(4))
+        def test_a(snapshot, i):
+            value = snapshot()
+            assert value == "same"
+            assert value.upper() == "SAME"
+        """
+    )
+    snapshots = pytester.path / "snapshots"
+
+    result = pytester.runpytest("--insta=record", "--insta-dedup")
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(["NOTICE 3 snapshots deduplicated into 1 object*"])
+    assert len({(snapshots / f"t__a_{i}__0.txt").stat().st_ino for i in range(4)}) == 1
+    assert (snapshots / ".objects" / ".gitignore").read_text() == "*\n"
+    assert len(list((snapshots / ".objects").glob("[!.]*"))) == 1
+
+    result = pytester.runpytest("--insta=update-none", "--insta-dedup")
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(["NOTICE 3 snapshots loaded from the dedup cache"])
+
+    pytester.makepyfile(
+        test_t="""
+        import pytest
+
+        @pytest.mark.parametrize("i", range(4))
+        def test_a(snapshot, i):
+            assert snapshot() == f"value{i % 2}"
+        """
+    )
+
+    result = pytester.runpytest("--insta=update", "--insta-dedup")
+    result.assert_outcomes(passed=4)
+    result.stdout.fnmatch_lines(["NOTICE 2 snapshots deduplicated into 2 objects*"])
+    assert len(list((snapshots / ".objects").glob("[!.]*"))) == 2
+    assert [(snapshots / f"t__a_{i}__0.txt").read_text() for i in range(4)] == [
+        "value0",
+        "value1",
+        "value0",
+        "value1",
+    ]
+
+
+def test_dedup_edit(pytester: Pytester):
+    pytester.makepyfile(
+        test_t="""
+        import pytest
+
+        @pytest.mark.parametrize("i", range(2))
+        def test_a(snapshot, i):
+            assert snapshot() == "same"
+        """
+    )
+    pytester.runpytest("--insta=record", "--insta-dedup").assert_outcomes(passed=2)
+
+    edited, sibling = [pytester.path / "snapshots" / f"t__a_{i}__0.txt" for i in (0, 1)]
+    assert not edited.stat().st_mode & 0o222
+
+    if os.name == "posix" and os.geteuid() != 0:
+        with pytest.raises(PermissionError):
+            edited.write_text("edited")
+
+    edited.unlink()
+    edited.write_text("edited")
+    assert sibling.read_text() == "same"
+
+    result = pytester.runpytest("--insta=update-none", "--insta-dedup")
+    result.assert_outcomes(passed=1, failed=1)
+
+
+def test_prefetcher_eviction():
+    storage = MemoryStorage()
+    paths = [Path(f"snapshots/mod__test__{i}.txt") for i in range(3)]
+    for path in paths:
+        storage.write(path, {"": b"x" * 10})
+
+    prefetcher = SnapshotPrefetcher(storage, limit=20)
+    prefetcher.fetch(paths[0])
+    prefetcher.fetch(paths[1])
+    assert prefetcher.get(paths[0])
+    prefetcher.fetch(paths[2])
+
+    assert list(prefetcher.cache) == [paths[0], paths[2]]
+    assert prefetcher.size == 20
+
+
+def test_digest_manifest(pytester: Pytester):
+    pytester.makepyfile(
+        test_t="""
+        def test_a(snapshot):
+            assert snapshot() == "hello"
+            assert snapshot() == "world"
+        """
+    )
+    pytester.runpytest("--insta=record").assert_outcomes(passed=1)
+
+    snapshots = sorted((pytester.path / "snapshots").iterdir())
+    keys = [os.path.abspath(path) for path in snapshots]
+    manifest = pytester.path / ".pytest_cache" / "v" / "insta" / "manifest"
+
+    # Snapshots modified in the last two seconds aren't cached yet.
+    pytester.runpytest("--insta=update").assert_outcomes(passed=1)
+    assert not manifest.exists()
+
+    for path in snapshots:
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10_000_000_000))
+
+    pytester.runpytest("--insta=update").assert_outcomes(passed=1)
+    assert sorted(json.loads(manifest.read_text())) == keys
+
+    result = pytester.runpytest("--insta=update", "--insta-profile")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["compare*2 cached digests"])
+
+    pytester.makepyfile(
+        test_t="""
+        def test_a(snapshot):
+            assert snapshot() == "hello"
+        """
+    )
+    result = pytester.runpytest("--insta=update")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["DELETE snapshots/t__a__1.txt"])
+    assert sorted(json.loads(manifest.read_text())) == keys[:1]
@@ -0,0 +1,84 @@
+from pytest import Pytester
+
+
+def test_writer_error(pytester: Pytester):
+    pytester.makeconftest(
+        """
+        from pathlib import Path
+
+        from pytest_insta import FmtText
+
+        class FmtFragile(FmtText):
+            extension = ".fragile"
+
+            def dump(self, path: Path, value: str):
+                if value == "broken":
+                    raise ValueError("can't dump broken")
+                super().dump(path, value)
+        """
+    )
+    pytester.makepyfile(
+        test_t="""
+        def test_t(snapshot):
+            assert snapshot("fragile") == "broken"
+
+        def test_u(snapshot):
+            assert snapshot("fragile") == "hello"
+        """
+    )
+
+    result = pytester.runpytest("--insta=record", "--insta-writers=2")
+    assert result.ret != 0
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(
+        [
+            "*SNAPSHOTS*",
+            "CREATE snapshots/t__u__0.fragile",
+            "ERROR snapshots/t__t__0.fragile (test_t.py::test_t)"
+            " - ValueError: can't dump broken",
+        ]
+    )
+    assert not (pytester.path / "snapshots" / "t__t__0.fragile").exists()
+    assert (pytester.path / "snapshots" / "t__u__0.fragile").read_text() == "hello"
+
+
+def test_writer_pending(pytester: Pytester):
+    pytester.makeconftest(
+        """
+        import time
+        from pathlib import Path
+
+        from pytest_insta import FmtText
+
+        class FmtSlow(FmtText):
+            extension = ".slow"
+
+            def dump(self, path: Path, value: str):
+                time.sleep(0.5)
+                super().dump(path, value)
+                with open(Path(__file__).parent / "dumps.log", "a") as f:
+                    f.write(value + "\\n")
+        """
+    )
+    pytester.makepyfile(
+        test_t="""
+        def test_t(snapshot):
+            assert snapshot("slow") == "world"
+        """
+    )
+    path = pytester.path / "snapshots" / "t__t__0.slow"
+    path.parent.mkdir()
+    path.write_text("hello")
+
+    # The duplicate test loads the snapshot while the first one is still being
+    # written, it should see the updated content instead of dumping it again.
+    result = pytester.runpytest(
+        "--insta=update",
+        "--insta-writers=2",
+        "--keep-duplicates",
+        "test_t.py",
+        "test_t.py",
+    )
+    result.assert_outcomes(passed=2)
+    assert path.read_text() == "world"
+    assert (pytester.path / "dumps.log").read_text() == "world\n"